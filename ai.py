@@ -1,42 +1,117 @@
 # chat_agent.py
-import os, asyncio, argparse, json
-from openai import AsyncOpenAI
-import tiktoken
-import streamlit as st
+import os, asyncio, argparse, json, contextvars, weakref
+from dataclasses import dataclass, fields, replace
+from typing import Optional, Tuple
+# openai and streamlit are imported on first use to keep startup fast
+from response_cache import response_cache, make_cache_key
+from token_counter import count_tokens  # Re-exported for existing callers
+from rate_limiter import scheduler, AIRequestError, AIRequestRejectedError, AIRetriesExhaustedError
 
 
-def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
-    """Return the number of tokens a plain string will use for the given model."""
-    enc = tiktoken.encoding_for_model(model)
-    return len(enc.encode(text))
+@dataclass(frozen=True, slots=True)
+class GenerationParams:
+    """Model and sampling parameters of one AI request.
 
+    Immutable and hashable, so one instance can be shared by concurrent tasks
+    and per-request variants are derived with with_overrides().
+    """
+    model: str = "gpt-4o-mini"
+    temp: float = 0.7
+    top_p: float = 1.0
+    max_tokens: int = 512
+    pp: float = 0.0
+    fp: float = 0.0
+    seed: Optional[int] = None
+    stop: Optional[Tuple[str, ...]] = None
 
-def parse_args():
+    def __post_init__(self):
+        # Stop sequences arrive as lists from argparse and the UI; keep them hashable
+        if self.stop is not None and not isinstance(self.stop, tuple):
+            object.__setattr__(self, "stop", tuple(self.stop))
+
+    def with_overrides(self, params_dict):
+        """Returns a copy with the known keys of params_dict applied; unknown keys are ignored."""
+        overrides = {key: value for key, value in params_dict.items() if key in GENERATION_FIELDS}
+        return replace(self, **overrides) if overrides else self
+
+    @classmethod
+    def from_args(cls, namespace):
+        """Builds parameters from an argparse namespace with the flags of parse_args()."""
+        return cls(**{name: getattr(namespace, name) for name in GENERATION_FIELDS if hasattr(namespace, name)})
+
+    def completion_kwargs(self):
+        """Keyword arguments for client.chat.completions.create."""
+        return {
+            "model": self.model,
+            "temperature": self.temp,
+            "top_p": self.top_p,
+            "max_tokens": self.max_tokens,
+            "presence_penalty": self.pp,
+            "frequency_penalty": self.fp,
+            "stop": list(self.stop) if self.stop else None,
+            "seed": self.seed,
+        }
+
+GENERATION_FIELDS = frozenset(field.name for field in fields(GenerationParams))
+DEFAULT_PARAMS = GenerationParams()
+
+def parse_args(argv=None):
+    """Parses the command-line flags of the chat agent. Only called when ai.py is run directly."""
     p = argparse.ArgumentParser(description="Tiny configurable ChatGPT agent")
-    p.add_argument("-m", "--model",     default="gpt-4o-mini")
-    p.add_argument("-t", "--temp",      type=float, default=0.7, help="temperature")
-    p.add_argument("-p", "--top_p",     type=float, default=1.0)
-    p.add_argument("-k", "--max_tokens",type=int,   default=512)
-    p.add_argument("--pp",              type=float, default=0.0, help="presence_penalty")
-    p.add_argument("--fp",              type=float, default=0.0, help="frequency_penalty")
+    p.add_argument("-m", "--model",     default=DEFAULT_PARAMS.model)
+    p.add_argument("-t", "--temp",      type=float, default=DEFAULT_PARAMS.temp, help="temperature")
+    p.add_argument("-p", "--top_p",     type=float, default=DEFAULT_PARAMS.top_p)
+    p.add_argument("-k", "--max_tokens",type=int,   default=DEFAULT_PARAMS.max_tokens)
+    p.add_argument("--pp",              type=float, default=DEFAULT_PARAMS.pp, help="presence_penalty")
+    p.add_argument("--fp",              type=float, default=DEFAULT_PARAMS.fp, help="frequency_penalty")
     p.add_argument("--seed",            type=int,   default=None)
     p.add_argument("--stop",            nargs="*",  default=None,
                    help="one or more stop strings")
-    return p.parse_args()
-
-ARGS = parse_args()
-
-# Initialize OpenAI client with API key from Streamlit secrets
-try:
-    client = AsyncOpenAI(api_key=st.secrets["openai"]["api_key"])
-except Exception as e:
-    # Fall back to environment variable if not running in Streamlit or secrets not configured
-    import os
-    client = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-    if not os.environ.get("OPENAI_API_KEY"):
-        print("Warning: No OpenAI API key found in Streamlit secrets or environment variables.")
-        print("         Please set up the API key in .streamlit/secrets.toml for deployment.")
-        print(f"Error details: {e}")
+    return GenerationParams.from_args(p.parse_args(argv))
+
+# Connection pool of the OpenAI client. Idle connections are kept long enough
+# to be reused by the next generation instead of repeating the TLS handshake.
+HTTP_MAX_CONNECTIONS = 100
+HTTP_MAX_KEEPALIVE = 20
+HTTP_KEEPALIVE_EXPIRY = 300.0     # Seconds an idle connection stays open
+
+def _create_client():
+    """Builds the OpenAI client. Retries are handled by rate_limiter.scheduler, so the client's own are disabled."""
+    import httpx
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+    http_client = DefaultAsyncHttpxClient(limits=httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    ))
+    # Use the API key from Streamlit secrets when available
+    try:
+        import streamlit as st
+        return AsyncOpenAI(api_key=st.secrets["openai"]["api_key"], max_retries=0, http_client=http_client)
+    except Exception as e:
+        # Fall back to environment variable if not running in Streamlit or secrets not configured
+        if not os.environ.get("OPENAI_API_KEY"):
+            print("Warning: No OpenAI API key found in Streamlit secrets or environment variables.")
+            print("         Please set up the API key in .streamlit/secrets.toml for deployment.")
+            print(f"Error details: {e}")
+        return AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"), max_retries=0, http_client=http_client)
+
+# One client per event loop: its pooled connections belong to the loop they were opened on
+_loop_clients = weakref.WeakKeyDictionary()
+
+def get_client():
+    """Returns the OpenAI client of the running event loop, creating it on first use.
+
+    The Streamlit app runs every request on async_runner's long-lived loop,
+    so it shares a single client and connection pool across reruns and
+    sessions. Short-lived loops (asyncio.run in the CLIs) get their own client
+    and never touch a pool bound to a closed loop.
+    """
+    loop = asyncio.get_running_loop()
+    client = _loop_clients.get(loop)
+    if client is None:
+        client = _loop_clients[loop] = _create_client()
+    return client
 
 # Comprehensive system prompt for documentation generation
 SYSTEM = """
@@ -58,64 +133,170 @@ YOUR OUTPUT SHOULD BE VALID MARKDOWN THAT RENDERS PROPERLY IN STANDARD MARKDOWN
 YOUR RESPONSE IS THE DIRECT MARKDOWN CONTENT DISPLAYED IN THE MARKDOWN VIEWER.
 """
 
-async def get_ai_response(user_prompt_content: str, system_prompt_content: str, args_namespace: argparse.Namespace):
-    """Generates a response from the AI based on provided prompts and parameters."""
+# Usage counters of the current task tree, installed with track_usage()
+_usage = contextvars.ContextVar("ai_usage", default=None)
+
+def track_usage():
+    """Starts counting requests and tokens for the current async task and the tasks it spawns.
+
+    Returns the counter dictionary, which get_ai_response updates in place.
+    """
+    usage = {"requests": 0, "cache_hits": 0, "prompt_tokens": 0, "completion_tokens": 0}
+    _usage.set(usage)
+    return usage
+
+def _record_usage(completion=None, cache_hit=False):
+    usage = _usage.get()
+    if usage is None:
+        return
+    if cache_hit:
+        usage["cache_hits"] += 1
+        return
+    usage["requests"] += 1
+    if completion is not None and getattr(completion, "usage", None) is not None:
+        usage["prompt_tokens"] += completion.usage.prompt_tokens or 0
+        usage["completion_tokens"] += completion.usage.completion_tokens or 0
+
+def _estimate_request_tokens(msgs, args_namespace):
+    """Tokens a request counts against the rate limit: prompt plus the completion allowance."""
+    prompt_tokens = sum(count_tokens(m["content"], args_namespace.model) + 4 for m in msgs)
+    return prompt_tokens + (args_namespace.max_tokens or 0)
+
+async def _create_completion(msgs, args_namespace: GenerationParams, stream=False, estimated=None):
+    """Sends a chat completion request through the rate-limit scheduler.
+
+    Non-streamed requests return their unused token allowance to the scheduler
+    here; streams ask for a final usage chunk and stream_completion settles
+    from it once the stream ends.
+
+    Raises:
+        AIRequestRejectedError: If the API rejects the request permanently
+        AIRetriesExhaustedError: If rate limits or server errors persist through every retry
+    """
+    if estimated is None:
+        estimated = _estimate_request_tokens(msgs, args_namespace)
+    stream_kwargs = {"stream_options": {"include_usage": True}} if stream else {}
+
+    async def attempt():
+        raw = await get_client().chat.completions.with_raw_response.create(
+            messages=msgs,
+            stream=stream,
+            **stream_kwargs,
+            **args_namespace.completion_kwargs(),
+        )
+        scheduler.update_from_headers(raw.headers)
+        return raw.parse()
+
+    completion = await scheduler.run(attempt, estimated)
+    if not stream and getattr(completion, "usage", None) is not None:
+        scheduler.settle(estimated, completion.usage.total_tokens)
+    return completion
+
+async def get_ai_response(user_prompt_content: str, system_prompt_content: str, args_namespace: GenerationParams, use_cache: bool = True):
+    """Generates a response from the AI based on provided prompts and parameters.
+
+    Identical requests (same model, sampling parameters and prompts) are served
+    from the on-disk response cache unless use_cache is False. Rate limits and
+    transient errors are retried by the shared scheduler.
+
+    Raises:
+        AIRequestError: If the request fails permanently or after all retries
+    """
+    cache_key = make_cache_key(user_prompt_content, system_prompt_content, args_namespace)
+    if use_cache:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            _record_usage(cache_hit=True)
+            return cached
+
     msgs = [
         {"role": "system", "content": system_prompt_content},
         {"role": "user", "content": user_prompt_content}
     ]
 
-    # Count tokens
-    #token_count = count_tokens(user_prompt_content + system_prompt_content)
-    #print(f"Token count: {token_count}")
+    try:
+        completion = await _create_completion(msgs, args_namespace)
+    except AIRequestError as e:
+        print(f"Error in get_ai_response: {e}")
+        raise
+    _record_usage(completion)
+    content = completion.choices[0].message.content
+    if content is None:
+        raise AIRequestRejectedError(f"AI returned no content (finish_reason={completion.choices[0].finish_reason})")
+    if use_cache:
+        response_cache.put(cache_key, content, {"model": args_namespace.model})
+    return content
+
+async def stream_completion(msgs, args_namespace: GenerationParams):
+    """Yields content deltas of a streamed chat completion as they arrive.
+
+    Opening the stream is scheduled and retried like get_ai_response; errors
+    after the first delta propagate to the caller. The final chunk carries the
+    request's token usage, which settles the rate-limit reservation and is
+    added to the counters of track_usage().
+    """
+    estimated = _estimate_request_tokens(msgs, args_namespace)
+    stream = await _create_completion(msgs, args_namespace, stream=True, estimated=estimated)
+
+    usage_chunk = None
+    async for chunk in stream:
+        if getattr(chunk, "usage", None) is not None:
+            usage_chunk = chunk
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content or ""
+        if delta:
+            yield delta
 
-    #if token_count > args_namespace.max_tokens:
-    #    print(f"Warning: Token count exceeds max_tokens ({token_count} > {args_namespace.max_tokens})")
-    #    return "Token count exceeds max_tokens"
+    if usage_chunk is not None:
+        scheduler.settle(estimated, usage_chunk.usage.total_tokens)
+    _record_usage(usage_chunk)
 
+async def stream_ai_response(user_prompt_content: str, system_prompt_content: str, args_namespace: GenerationParams, use_cache: bool = True):
+    """Streaming variant of get_ai_response: yields the response text chunk by chunk.
 
+    Raises:
+        AIRequestError: If the request fails permanently or after all retries
+    """
+    cache_key = make_cache_key(user_prompt_content, system_prompt_content, args_namespace)
+    if use_cache:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            _record_usage(cache_hit=True)
+            yield cached
+            return
+
+    msgs = [
+        {"role": "system", "content": system_prompt_content},
+        {"role": "user", "content": user_prompt_content}
+    ]
+
+    import openai  # Loaded by the client by now; needed for the error type below
+    reply = ""
     try:
-        completion = await client.chat.completions.create(
-            model=args_namespace.model,
-            messages=msgs,
-            temperature=args_namespace.temp,
-            top_p=args_namespace.top_p,
-            max_tokens=args_namespace.max_tokens,
-            presence_penalty=args_namespace.pp,
-            frequency_penalty=args_namespace.fp,
-            stop=args_namespace.stop,
-            seed=args_namespace.seed,
-            stream=False,  # We want the full response for this function
-        )
-        return completion.choices[0].message.content
-    except Exception as e:
-        print(f"Error in get_ai_response: {e}")
-        return "Error in get_ai_response"
+        async for delta in stream_completion(msgs, args_namespace):
+            reply += delta
+            yield delta
+    except AIRequestError as e:
+        print(f"Error in stream_ai_response: {e}")
+        raise
+    except openai.APIError as e:
+        # The stream broke after it started; earlier deltas cannot be retracted
+        print(f"Error in stream_ai_response: {e}")
+        raise AIRetriesExhaustedError(f"AI response stream interrupted: {e}", getattr(e, "status_code", None)) from e
+    if use_cache:
+        response_cache.put(cache_key, reply, {"model": args_namespace.model})
 
-async def chat():
+async def chat(params: GenerationParams):
     msgs = [{"role": "system", "content": SYSTEM}]
     print("ChatGPT-lite (Ctrl-C to quit)\n")
     while True:
         user = input("You ▸ ")
         msgs.append({"role": "user", "content": user})
 
-        stream = await client.chat.completions.create(
-            model=ARGS.model,
-            messages=msgs,
-            temperature=ARGS.temp,
-            top_p=ARGS.top_p,
-            max_tokens=ARGS.max_tokens,
-            presence_penalty=ARGS.pp,
-            frequency_penalty=ARGS.fp,
-            stop=ARGS.stop,
-            seed=ARGS.seed,
-            stream=True,
-        )
-
         reply = ""
         print("🤖▸ ", end="", flush=True)
-        async for chunk in stream:
-            delta = chunk.choices[0].delta.content or ""
+        async for delta in stream_completion(msgs, params):
             reply += delta
             print(delta, end="", flush=True)
         print()
@@ -123,6 +304,6 @@ async def chat():
 
 if __name__ == "__main__":
     try:
-        asyncio.run(chat())
+        asyncio.run(chat(parse_args()))
     except (KeyboardInterrupt, EOFError):
         print("\nBye!")
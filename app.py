@@ -1,16 +1,32 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
 import time
 import os
 from docs_generation import generate_documentation
 import subprocess
 import shutil
 import json
-import asyncio
-import argparse
-from ai import get_ai_response, SYSTEM, parse_args as ai_parse_args, count_tokens # Renamed to avoid conflict if app.py has its own parse_args
-from repo_tools import get_repo_file_tree, get_local_repo_contents, clone_github_repo  # Import functions from repo_tools.py
+from async_runner import run_async, iterate_async, CallbackRelay
+from ai import stream_ai_response, SYSTEM, DEFAULT_PARAMS
+from repo_tools import get_repo_file_tree, get_local_repo_contents, clone_github_repo, index_token_counts  # Import functions from repo_tools.py
+from workspace import workspace_manager, WorkspaceQuotaError
+from repo_snapshot import get_repo_snapshot, invalidate_repo_snapshot
+from token_counter import count_tokens
+from map_reduce_docs import generate_map_reduce_documentation, DEFAULT_CHUNK_TOKENS, DEFAULT_MAP_CONCURRENCY
+from context_packer import pack_context, render_packed_context, DEFAULT_CONTEXT_BUDGET
+from doc_export import build_export, EXPORT_FORMATS
+
+# Documentation package formats offered on the save screen
+EXPORT_FORMAT_LABELS = {"ZIP (.zip)": "zip", "Tarball (.tar.gz)": "tar.gz", "Single Markdown file (.md)": "md"}
+
+# Repository contents browser: page sizes, longest file preview, and code highlighting by extension
+CONTENTS_PAGE_SIZES = [25, 50, 100]
+CONTENTS_PREVIEW_CHARS = 200000
+CODE_LANGUAGES = {
+    '.py': 'python', '.js': 'javascript', '.jsx': 'jsx', '.ts': 'typescript', '.tsx': 'tsx',
+    '.json': 'json', '.md': 'markdown', '.yml': 'yaml', '.yaml': 'yaml', '.toml': 'toml',
+    '.html': 'html', '.css': 'css', '.sh': 'bash', '.go': 'go', '.rs': 'rust', '.java': 'java',
+    '.c': 'c', '.h': 'c', '.cpp': 'cpp', '.cs': 'csharp', '.rb': 'ruby', '.php': 'php', '.sql': 'sql',
+}
 
 # Set page configuration
 st.set_page_config(
@@ -54,6 +70,9 @@ if 'documentation_config' not in st.session_state:
 if 'repo_contents' not in st.session_state:
     st.session_state.repo_contents = {}
 
+if 'repo_index' not in st.session_state:
+    st.session_state.repo_index = {}
+
 if 'repo_pulled' not in st.session_state:
     st.session_state.repo_pulled = False
 
@@ -66,24 +85,39 @@ if 'lightning_sprint_active' not in st.session_state:
 if 'lightning_draft_active' not in st.session_state:
     st.session_state.lightning_draft_active = False
 
+if 'lightning_marathon_active' not in st.session_state:
+    st.session_state.lightning_marathon_active = False
+
 if 'show_review' not in st.session_state:
     st.session_state.show_review = False
 
 if 'show_save_options' not in st.session_state:
     st.session_state.show_save_options = False
 
-# Helper function to create an argparse.Namespace from a dictionary of parameters
+# Give each session its own repo and docs directories so concurrent sessions don't clobber each other
+if 'workspace_id' not in st.session_state:
+    st.session_state.workspace_id = workspace_manager.new_session_id()
+workspace = workspace_manager.get(st.session_state.workspace_id)
+
+# Helper function to create generation parameters from a dictionary of parameters
 def create_ai_args_namespace(params_dict):
-    # Get default args from ai.py's parser
-    default_args = ai_parse_args()
-    
-    # Override defaults with provided params
-    for key, value in params_dict.items():
-        if hasattr(default_args, key):
-            setattr(default_args, key, value)
-        # else: # Optional: handle unexpected params if necessary
-            # print(f"Warning: Parameter '{key}' not found in AI default args.")
-    return default_args
+    # Derive immutable generation parameters from the defaults; unknown keys are ignored
+    return DEFAULT_PARAMS.with_overrides(params_dict)
+
+# Helper function to render an AI response into a placeholder while it streams in.
+# The request runs on the shared background loop; deltas are rendered on the script thread
+def render_ai_stream(user_prompt_content, system_prompt_content, ai_args, placeholder):
+    response = ""
+    for delta in iterate_async(stream_ai_response(user_prompt_content, system_prompt_content, ai_args)):
+        response += delta
+        placeholder.markdown(response + "▌")
+    placeholder.markdown(response)
+    return response
+
+# Helper function to format one file for the Lightning Sprint prompt
+def format_sprint_block(file_path, content, truncated):
+    note = "\n... (file truncated to fit the token budget)" if truncated else ""
+    return f"\n\n#### {file_path}\n```\n{content}\n```{note}\n"
 
 # Helper function to format the advanced prompt for Lightning Draft
 def format_advanced_prompt(advanced_prompt_config):
@@ -338,7 +372,7 @@ elif 'show_review' in st.session_state and st.session_state.show_review:
     active_step = 4
 elif 'documentation_generated' in st.session_state and st.session_state.documentation_generated:
     active_step = 4
-elif 'lightning_sprint_active' in st.session_state and st.session_state.lightning_sprint_active or 'lightning_draft_active' in st.session_state and st.session_state.lightning_draft_active:
+elif st.session_state.get('lightning_sprint_active') or st.session_state.get('lightning_draft_active') or st.session_state.get('lightning_marathon_active'):
     active_step = 3
 elif 'show_step3' in st.session_state and st.session_state.show_step3:
     active_step = 3
@@ -434,8 +468,11 @@ if current_step > 1:
                 st.session_state.show_save_options = False
                 st.session_state.lightning_sprint_active = False
                 st.session_state.lightning_draft_active = False
+                st.session_state.lightning_marathon_active = False
                 if 'repo_contents' in st.session_state:
                     del st.session_state.repo_contents
+                if 'repo_index' in st.session_state:
+                    del st.session_state.repo_index
                 
             elif selected_step <= 2:
                 # Reset to Step 2 (Examine Repository)
@@ -446,6 +483,7 @@ if current_step > 1:
                 st.session_state.show_save_options = False
                 st.session_state.lightning_sprint_active = False
                 st.session_state.lightning_draft_active = False
+                st.session_state.lightning_marathon_active = False
                 
             elif selected_step <= 3:
                 # Reset to Step 3 (Generate Documentation)
@@ -455,6 +493,7 @@ if current_step > 1:
                 st.session_state.show_save_options = False
                 st.session_state.lightning_sprint_active = False
                 st.session_state.lightning_draft_active = False
+                st.session_state.lightning_marathon_active = False
             
             # Force UI refresh
             st.rerun()
@@ -532,14 +571,16 @@ def on_pull_repo():
         # Use the clone_github_repo function from repo_tools.py to actually clone the repository
         with st.sidebar.status("Cloning repository...") as status:
             # Check if repository directory exists
-            repo_dir = "repo"
+            repo_dir = workspace.repo_dir
             if os.path.exists(repo_dir):
                 status.update(label=f"Preparing to replace existing repository...")
                 # Handling is done inside clone_github_repo function, just informing the user
             
             # Clone the repository
             status.update(label=f"Cloning {github_url}...")
-            clone_github_repo(github_url)
+            invalidate_repo_snapshot(repo_dir)
+            clone_github_repo(github_url, repo_dir=repo_dir)
+            workspace_manager.check_quota(workspace)
             status.update(label="Repository cloned successfully!", state="complete", expanded=False)
         
         # After successful clone, update the session state
@@ -548,7 +589,14 @@ def on_pull_repo():
         # Reset any session state related to repository content
         if 'repo_contents' in st.session_state:
             del st.session_state.repo_contents
+        if 'repo_index' in st.session_state:
+            del st.session_state.repo_index
             
+    except WorkspaceQuotaError as e:
+        # Don't keep a repository that doesn't fit in the session's quota
+        shutil.rmtree(workspace.repo_dir, ignore_errors=True)
+        st.sidebar.error(f"Repository is too large: {str(e)}")
+        st.session_state.repo_pulled = False
     except Exception as e:
         st.sidebar.error(f"Error cloning repository: {str(e)}")
         st.session_state.repo_pulled = False
@@ -557,28 +605,39 @@ def on_examine_repo():
     st.session_state.show_repo_contents = True
     st.session_state.show_step3 = True
     
-    # Store repo contents in session state
-    repo_path = "repo"
+    # Store a lazy view of the repo contents in session state; files are read when used
+    repo_path = workspace.repo_dir
     if os.path.exists(repo_path) and os.path.isdir(repo_path):
-        st.session_state.repo_contents = get_local_repo_contents(repo_path)
+        st.session_state.repo_contents, st.session_state.repo_index = get_local_repo_contents(repo_path, with_index=True, lazy=True)
     
 def on_lightning_sprint():
     st.session_state.lightning_sprint_active = True
     # When Lightning Sprint is activated, deactivate other modes
     st.session_state.show_repo_contents = False
     st.session_state.lightning_draft_active = False
+    st.session_state.lightning_marathon_active = False
     
 def on_lightning_draft():
     st.session_state.lightning_draft_active = True
     # When Lightning Draft is activated, deactivate other modes
     st.session_state.show_repo_contents = False
     st.session_state.lightning_sprint_active = False
+    st.session_state.lightning_marathon_active = False
+    st.session_state.show_review = False
+    
+def on_lightning_marathon():
+    st.session_state.lightning_marathon_active = True
+    # When Lightning Marathon is activated, deactivate other modes
+    st.session_state.show_repo_contents = False
+    st.session_state.lightning_sprint_active = False
+    st.session_state.lightning_draft_active = False
     st.session_state.show_review = False
     
 def on_review_documentation():
     # When Review Documentation is activated, deactivate other modes
     st.session_state.show_review = True
     st.session_state.lightning_draft_active = False
+    st.session_state.lightning_marathon_active = False
     st.session_state.lightning_sprint_active = False
     st.session_state.show_repo_contents = False
     st.session_state.show_save_options = False
@@ -588,6 +647,7 @@ def on_save_documentation():
     st.session_state.show_save_options = True
     st.session_state.show_review = False
     st.session_state.lightning_draft_active = False
+    st.session_state.lightning_marathon_active = False
     st.session_state.lightning_sprint_active = False
     st.session_state.show_repo_contents = False
 
@@ -652,9 +712,11 @@ if st.session_state.repo_pulled:
         if in_step4:
             st.sidebar.button("Lightning Sprint", disabled=True)
             st.sidebar.button("Lightning Draft", disabled=True)
+            st.sidebar.button("Lightning Marathon", disabled=True)
         else:
             st.sidebar.button("Lightning Sprint", on_click=on_lightning_sprint)
             st.sidebar.button("Lightning Draft", on_click=on_lightning_draft)
+            st.sidebar.button("Lightning Marathon", on_click=on_lightning_marathon, help="Map-reduce generation for repositories too large for a single prompt")
         
         # Step 4 appears after documentation is generated
         if st.session_state.documentation_generated:
@@ -668,20 +730,66 @@ if st.session_state.repo_pulled:
                 st.sidebar.header("Step 5.) Save Documentation")
                 st.sidebar.button("Save Options", on_click=on_save_documentation)
 
+# Function to display a paginated, searchable browser of the repository contents.
+# Only the current page's metadata and the one selected file are rendered, so the
+# cost of a rerun doesn't grow with the size of the repository.
+def display_contents_browser(repo_contents, repo_index):
+    search_col, sort_col, size_col = st.columns([3, 1, 1])
+    with search_col:
+        query = st.text_input("Search files", key="contents_search", placeholder="Filter by path, e.g. src/ or .py")
+    with sort_col:
+        sort_by = st.selectbox("Sort by", ["Path", "Size", "Tokens"], key="contents_sort")
+    with size_col:
+        page_size = st.selectbox("Files per page", CONTENTS_PAGE_SIZES, index=1, key="contents_page_size")
+    
+    paths = list(repo_contents)
+    if query:
+        lowered = query.lower()
+        paths = [rel_path for rel_path in paths if lowered in rel_path.lower()]
+    if sort_by == "Size":
+        paths.sort(key=lambda rel_path: -repo_index.get(rel_path, {}).get('bytes', 0))
+    elif sort_by == "Tokens":
+        paths.sort(key=lambda rel_path: -repo_index.get(rel_path, {}).get('tokens', 0))
+    else:
+        paths.sort()
+    
+    if not paths:
+        st.info("No files match the search.")
+        return
+    
+    page_count = (len(paths) + page_size - 1) // page_size
+    page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1, step=1, key="contents_page")
+    page = min(page, page_count)
+    page_paths = paths[(page - 1) * page_size:page * page_size]
+    st.caption(f"Showing files {(page - 1) * page_size + 1}-{(page - 1) * page_size + len(page_paths)} of {len(paths)}"
+               + (f" matching '{query}'" if query else ""))
+    
+    st.dataframe(
+        [{
+            "File": rel_path,
+            "Size (KB)": round(repo_index.get(rel_path, {}).get('bytes', 0) / 1024, 1),
+            "Lines": repo_index.get(rel_path, {}).get('lines'),
+            "Tokens": repo_index.get(rel_path, {}).get('tokens'),
+        } for rel_path in page_paths],
+        use_container_width=True,
+        hide_index=True,
+    )
+    
+    # Only the selected file is read from disk
+    selected = st.selectbox("View file", page_paths, key="contents_selected")
+    if selected:
+        content = repo_contents[selected]
+        if len(content) > CONTENTS_PREVIEW_CHARS:
+            st.caption(f"Showing the first {CONTENTS_PREVIEW_CHARS:,} of {len(content):,} characters.")
+            content = content[:CONTENTS_PREVIEW_CHARS]
+        extension = os.path.splitext(selected)[1].lower()
+        st.code(content, language=CODE_LANGUAGES.get(extension, "text"))
+
 # Function to display directory contents
-def display_directory_contents(path, indent=0):
-    """Recursively display directory contents in a tree-like structure"""
+def display_directory_contents(path):
+    """Display directory contents as one collapsible tree, built once per repository snapshot"""
     if os.path.isdir(path):
-        files = os.listdir(path)
-        for file in sorted(files):
-            file_path = os.path.join(path, file)
-            is_dir = os.path.isdir(file_path)
-            icon = "📁 " if is_dir else "📄 "
-            st.write(f"{' ' * indent}{icon}{file}")
-            
-            # Recursively display contents of subdirectories (limit depth to avoid too much nesting)
-            if is_dir and indent < 12:  # Limit nesting level
-                display_directory_contents(file_path, indent + 4)
+        st.markdown(get_repo_snapshot(path).tree_html(), unsafe_allow_html=True)
 
 # Add a styled container for main content
 st.markdown('<div class="main-panel-container">', unsafe_allow_html=True)
@@ -703,7 +811,7 @@ if st.session_state.show_save_options:
             st.info("Documentation is exported in Markdown (.md) format")
             
             # Check if docs directory exists
-            has_docs_dir = os.path.exists("docs") and os.path.isdir("docs")
+            has_docs_dir = os.path.exists(workspace.docs_dir) and os.path.isdir(workspace.docs_dir)
             
             # Single consolidated section for export options
             st.write("### 2. Export Options")
@@ -731,45 +839,34 @@ if st.session_state.show_save_options:
                 
                 # Direct download button - use different label based on docs dir inclusion
                 if include_docs_dir:
-                    # Need to create a zip file with all content
-                    import io
-                    import zipfile
-                    
-                    # Create in-memory zip file
-                    zip_buffer = io.BytesIO()
-                    with zipfile.ZipFile(zip_buffer, 'w') as zip_file:
-                        # Add main documentation with custom filename
-                        main_filename = f"{custom_filename}.md"
-                        
-                        # Always include metadata (no longer optional)
-                        content = st.session_state.documentation_content
-                        
-                        # Write main file to zip
-                        zip_file.writestr(main_filename, content)
-                        
-                        # Add all files from docs directory
-                        for root, dirs, files in os.walk("docs"):
-                            for file in files:
-                                file_path = os.path.join(root, file)
-                                # Get relative path from docs directory
-                                rel_path = os.path.relpath(file_path, "docs")
-                                # Add file to zip with path inside docs directory
-                                with open(file_path, 'rb') as f:
-                                    zip_file.writestr(os.path.join("docs", rel_path), f.read())
+                    export_label = st.radio(
+                        "Package format",
+                        list(EXPORT_FORMAT_LABELS),
+                        horizontal=True,
+                        help="ZIP or tar.gz keep the docs directory structure; the bundle appends every docs Markdown file to the main documentation"
+                    )
+                    export_format = EXPORT_FORMAT_LABELS[export_label]
                     
-                    # Reset buffer position
-                    zip_buffer.seek(0)
+                    # Built once per documentation version; the package path is its content hash
+                    main_filename = f"{custom_filename}.md"
+                    package_path = build_export(main_filename, st.session_state.documentation_content,
+                                                workspace.docs_dir, export_format)
+                    suffix, mime = EXPORT_FORMATS[export_format]
+                    package_filename = f"{custom_filename}_complete{suffix}"
                     
-                    # Custom zip filename
-                    zip_filename = f"{custom_filename}_complete.zip"
+                    # Read the package once per version and keep only the current one, so reruns reuse the bytes
+                    cached_package = st.session_state.get('export_package')
+                    if cached_package is None or cached_package[0] != package_path:
+                        with open(package_path, "rb") as package_file:
+                            cached_package = (package_path, package_file.read())
+                        st.session_state.export_package = cached_package
                     
-                    # Download button for zip file
                     st.download_button(
                         label="Download Complete Documentation Package",
-                        data=zip_buffer,
-                        file_name=zip_filename,
-                        mime="application/zip",
-                        help="Download main documentation and all docs directory files as a zip package"
+                        data=cached_package[1],
+                        file_name=package_filename,
+                        mime=mime,
+                        help="Download main documentation and all docs directory files as one package"
                     )
                 else:
                     # Just the main documentation file
@@ -817,7 +914,7 @@ elif st.session_state.show_review:
         
         if st.session_state.documentation_generated and st.session_state.documentation_content:
             # Create tabs for different views - add Docs Directory tab if enabled
-            has_docs_dir = os.path.exists("docs") and os.path.isdir("docs")
+            has_docs_dir = os.path.exists(workspace.docs_dir) and os.path.isdir(workspace.docs_dir)
             
             if has_docs_dir:
                 preview_tab, docs_dir_tab, raw_tab = st.tabs(["Main Documentation", "Docs Directory", "Raw Markdown"])
@@ -835,7 +932,7 @@ elif st.session_state.show_review:
                     
                     # Display the docs directory tree
                     st.subheader("Directory Structure")
-                    docs_path = "docs"
+                    docs_path = workspace.docs_dir
                     if os.path.exists(docs_path):
                         # Use the existing display_directory_contents function
                         display_directory_contents(docs_path)
@@ -1291,9 +1388,10 @@ elif st.session_state.lightning_draft_active:
             
             generated_documentation = "Error: AI did not return content."
             try:
-                with st.spinner(" Lightning Draft is thinking..."):
-                    # Make the actual AI call
-                    generated_documentation = asyncio.run(get_ai_response(formatted_user_prompt, SYSTEM, ai_args))
+                st.caption(" Lightning Draft is writing...")
+                # Make the actual AI call, rendering tokens as they arrive
+                stream_placeholder = st.empty()
+                generated_documentation = render_ai_stream(formatted_user_prompt, SYSTEM, ai_args, stream_placeholder)
                 st.success("Advanced documentation generated successfully!")
             except Exception as e:
                 st.error(f"Error during AI documentation generation: {e}")
@@ -1309,8 +1407,8 @@ elif st.session_state.lightning_draft_active:
                         # Call the generate_documentation function from test.py
                         generate_documentation(
                             docs_options=docs_options,
-                            target_repo="repo",  # Default repo directory
-                            output_dir="docs"    # Default docs directory
+                            target_repo=workspace.repo_dir,  # This session's repo directory
+                            output_dir=workspace.docs_dir    # This session's docs directory
                         )
                         
                         st.success(f"Generated docs directory with: {', '.join(docs_options)}")
@@ -1376,36 +1474,30 @@ elif st.session_state.lightning_sprint_active:
             
             generated_documentation = "Error: AI did not return content."
             try:
-                with st.spinner(" Lightning Sprint is thinking..."):
+                with st.spinner(" Lightning Sprint is preparing repository context..."):
                     # Prepare context with repository contents
                     if st.session_state.repo_contents:
                         # Create a context with repository structure and content
                         repo_context = f"\n\n### Repository Contents:\n"
                         
                         # Add file tree for structure overview
-                        repo_path = "repo"
+                        repo_path = workspace.repo_dir
                         if os.path.exists(repo_path) and os.path.isdir(repo_path):
                             repo_tree = get_repo_file_tree(repo_path)
                             repo_context += f"\n\n### Repository Structure:\n```\n{repo_tree}\n```\n\n"
                         
-                        # Count tokens in repo contents
-                        all_content = json.dumps(st.session_state.repo_contents)
-                        token_count = count_tokens(all_content)
-                        
-                        # If token count is manageable, include all file contents
-                        # Otherwise, just include the structure and file names
-                        MAX_TOKENS = 50000  # Set a reasonable limit
+                        # Pack file contents into the token budget, most important files first;
+                        # whatever doesn't fit is truncated or summarized
+                        budget = DEFAULT_CONTEXT_BUDGET - count_tokens(user_prompt + repo_context)
+                        packed = pack_context(st.session_state.repo_contents, budget, format_block=format_sprint_block,
+                                              token_counts=index_token_counts(st.session_state.get('repo_index', {})))
+                        repo_context += "\n\n### File Contents:\n"
+                        repo_context += render_packed_context(packed)
                         
-                        if token_count < MAX_TOKENS:
-                            repo_context += "\n\n### File Contents:\n"
-                            for file_path, content in st.session_state.repo_contents.items():
-                                repo_context += f"\n\n#### {file_path}\n```\n{content}\n```\n"
-                        else:
-                            # Just include file names if content is too large
-                            st.warning(f"Repository content is too large ({token_count} tokens). Sending only structure information to the AI.")
-                            repo_context += "\n\n### Files in repository:\n"
-                            for file_path in st.session_state.repo_contents.keys():
-                                repo_context += f"- {file_path}\n"
+                        not_full = len(packed['truncated']) + len(packed['summaries']) + len(packed['omitted'])
+                        if not_full:
+                            st.warning(f"Repository content exceeds the {DEFAULT_CONTEXT_BUDGET:,}-token budget. "
+                                       f"{len(packed['full'])} files are sent in full and {not_full} are truncated or summarized.")
                         
                         # Combine user prompt with repository context
                         full_prompt = f"{user_prompt}\n\n{repo_context}"
@@ -1413,8 +1505,10 @@ elif st.session_state.lightning_sprint_active:
                         full_prompt = user_prompt
                         st.warning("No repository contents available. Documentation may be limited.")
                     
-                    # Make the actual AI call with repository context
-                    generated_documentation = asyncio.run(get_ai_response(full_prompt, SYSTEM, ai_args))
+                # Make the actual AI call with repository context, rendering tokens as they arrive
+                st.caption(" Lightning Sprint is writing...")
+                stream_placeholder = st.empty()
+                generated_documentation = render_ai_stream(full_prompt, SYSTEM, ai_args, stream_placeholder)
                 st.success("Quick documentation generated successfully!")
             except Exception as e:
                 st.error(f"Error during AI documentation generation: {e}")
@@ -1450,10 +1544,87 @@ elif st.session_state.lightning_sprint_active:
             if st.button("Go to Documentation Review"):
                 on_review_documentation()
 
+elif st.session_state.lightning_marathon_active:
+    # Display map-reduce generation for large repositories
+    with repo_container:
+        st.markdown("<h1 style='text-align: center; color: grey;'> Lightning Marathon</h1>", unsafe_allow_html=True)
+        st.markdown("<h3 style='text-align: center;'>Documentation for Large Repositories</h3>", unsafe_allow_html=True)
+        st.divider()
+
+        st.markdown("<p style='text-align: center;'>Every module is summarized in parallel, then the summaries are combined into one document. "
+                    "Use this mode when the repository is too large for Lightning Sprint.</p>", unsafe_allow_html=True)
+        
+        user_prompt = st.text_area(
+            "Prompt", 
+            "Generate comprehensive documentation for this repository", 
+            height=150,
+            max_chars=1000,
+            help="Be specific about what kind of documentation you want")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            chunk_tokens = st.slider(
+                "Tokens per Chunk",
+                min_value=2000,
+                max_value=30000,
+                value=DEFAULT_CHUNK_TOKENS,
+                step=1000,
+                help="Source code tokens sent with each module summary request"
+            )
+        with col2:
+            map_concurrency = st.slider(
+                "Parallel Requests",
+                min_value=1,
+                max_value=16,
+                value=DEFAULT_MAP_CONCURRENCY,
+                help="Maximum number of summary requests running at the same time"
+            )
+        
+        if st.button("Generate Large-Repository Documentation", type="primary"):
+            st.session_state.sprint_prompt_content = {"prompt": user_prompt, "mode": "marathon"}
+            ai_args = create_ai_args_namespace(st.session_state.sprint_model_params)
+            
+            generated_documentation = "Error: AI did not return content."
+            if not st.session_state.repo_contents:
+                st.warning("No repository contents available. Please examine the repository first.")
+            else:
+                progress_bar = st.progress(0.0, text="Chunking repository...")
+                
+                def on_progress(done, total, message):
+                    progress_bar.progress(done / total if total else 1.0, text=message)
+                
+                # Progress is reported on the background loop; relay it to this script thread
+                relay = CallbackRelay()
+                try:
+                    generated_documentation = run_async(generate_map_reduce_documentation(
+                        st.session_state.repo_contents,
+                        user_prompt,
+                        ai_args,
+                        token_counts=index_token_counts(st.session_state.get('repo_index', {})),
+                        chunk_tokens=chunk_tokens,
+                        max_concurrency=map_concurrency,
+                        progress_callback=relay.wrap(on_progress)
+                    ), relay=relay)
+                    st.success("Large-repository documentation generated successfully!")
+                except Exception as e:
+                    st.error(f"Error during AI documentation generation: {e}")
+                    generated_documentation = f"Error generating documentation: {e}"
+
+                # Save documentation and configuration to session state
+                st.session_state.documentation_content = generated_documentation
+                st.session_state.documentation_generated = True
+                st.session_state.documentation_config = {
+                    "prompt_content": st.session_state.sprint_prompt_content,
+                    "model_params": st.session_state.sprint_model_params
+                }
+                
+                # Force a rerun to update the sidebar UI
+                st.rerun()
+
 # Only display repository contents when examine button was clicked and Lightning Sprint isn't active
 elif st.session_state.show_repo_contents:
     with repo_container:
-        repo_path = "repo"
+        repo_path = workspace.repo_dir
         if os.path.exists(repo_path) and os.path.isdir(repo_path):
             # Use markdown with HTML for centered and grey header
             st.markdown("<h1 style='text-align: center; color: grey;'>Repository Contents</h1>", unsafe_allow_html=True)
@@ -1461,16 +1632,17 @@ elif st.session_state.show_repo_contents:
             # Display token count information for the repository contents
             if st.session_state.repo_contents:
                 num_files = len(st.session_state.repo_contents)
-                all_content = json.dumps(st.session_state.repo_contents)
-                token_count = count_tokens(all_content)
+                repo_index = st.session_state.get('repo_index', {})
+                token_count = sum(entry['tokens'] for entry in repo_index.values())
+                total_mb = sum(entry['bytes'] for entry in repo_index.values()) / (1024 * 1024)
                 
-                st.info(f"Repository contains {num_files} files with approximately {token_count:,} tokens.")
+                st.info(f"Repository contains {num_files} files ({total_mb:.1f} MB) with approximately {token_count:,} tokens.")
             
-            # Get statistics about the repository
-            file_count = sum([len(files) for _, _, files in os.walk(repo_path)])
-            dir_count = sum([len(dirs) for _, dirs, _ in os.walk(repo_path)])
+            # Get statistics about the repository (cached until the next pull)
+            snapshot = get_repo_snapshot(repo_path)
             
-            st.info(f"Repository contains {file_count} files in {dir_count} directories.")
+            st.info(f"Repository contains {snapshot.file_count} files in {snapshot.dir_count} directories "
+                    f"({snapshot.total_bytes / (1024 * 1024):.1f} MB).")
             
             # Create tabs for different views of the repository
             file_tab, tree_tab, contents_tab = st.tabs(["📁 File Explorer", "🌳 Tree View", "📚 Content Stats"])
@@ -1482,14 +1654,13 @@ elif st.session_state.show_repo_contents:
                 
             with tree_tab:
                 st.write("Repository folder structure tree:")
-                # Display the formatted tree view using our new function
-                repo_tree = get_repo_file_tree(repo_path)
-                st.code(repo_tree)
+                # Display the formatted tree view from the snapshot
+                st.code(snapshot.tree_text)
                 
             with contents_tab:
                 st.write("Repository file contents:")
                 if st.session_state.repo_contents:
-                    st.json(st.session_state.repo_contents)
+                    display_contents_browser(st.session_state.repo_contents, st.session_state.get('repo_index', {}))
                 else:
                     st.info("No repository contents available.")
         else:
@@ -0,0 +1,175 @@
+#################################################
+# BACKGROUND EVENT LOOP
+#################################################
+
+# One event loop runs for the lifetime of the process on a daemon thread, and
+# synchronous code (Streamlit script runs) submits coroutines to it instead of
+# calling asyncio.run. The loop - and the pooled HTTP connections of the
+# OpenAI client bound to it - therefore survive across generations, reruns
+# and sessions, instead of being rebuilt and torn down every time.
+
+import sys
+import time
+import queue
+import asyncio
+import threading
+import concurrent.futures
+
+POLL_INTERVAL = 0.05              # Seconds between relayed-callback checks while waiting
+
+
+class BackgroundLoop:
+    """An asyncio event loop running forever on its own daemon thread, started on first use."""
+
+    def __init__(self, name="lightning-md-event-loop"):
+        self.name = name
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self):
+        with self._lock:
+            if self._loop is None or self._loop.is_closed() or not self._thread.is_alive():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._run_forever, args=(self._loop,), name=self.name, daemon=True)
+                self._thread.start()
+            return self._loop
+
+    @staticmethod
+    def _run_forever(loop):
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    def submit(self, coro):
+        """Schedules a coroutine on the loop and returns a concurrent.futures.Future for its result."""
+        if self._thread is not None and threading.current_thread() is self._thread:
+            raise RuntimeError("Cannot block on the background loop from inside it; await the coroutine instead")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self):
+        """Stops the loop and waits for its thread to finish."""
+        with self._lock:
+            if self._loop is None:
+                return
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+class CallbackRelay:
+    """
+    Forwards calls made on the background loop to the thread waiting in run_async.
+
+    Streamlit elements can only be updated from the script's own thread, so
+    callbacks such as progress reporting are wrapped with relay.wrap(); their
+    calls are queued and executed by run_async on the calling thread.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+
+    def wrap(self, fn):
+        def relayed(*args, **kwargs):
+            self._queue.put((fn, args, kwargs))
+        return relayed
+
+    def drain(self):
+        while True:
+            try:
+                fn, args, kwargs = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            fn(*args, **kwargs)
+
+
+_default_loop = None
+_default_loop_lock = threading.Lock()
+_streamlit_loop_factory = None
+
+
+def _new_background_loop():
+    return BackgroundLoop()
+
+
+def get_background_loop():
+    """
+    Returns the process-wide background loop.
+
+    Inside a Streamlit app it is kept with st.cache_resource, so every session
+    and rerun - and modules reloaded after a code change - share the same loop.
+    """
+    global _default_loop, _streamlit_loop_factory
+    # Decided on first use, so a module that imports streamlit later doesn't start a second loop
+    with _default_loop_lock:
+        if _streamlit_loop_factory is None and _default_loop is None:
+            if "streamlit" in sys.modules:
+                import streamlit as st
+                _streamlit_loop_factory = st.cache_resource(show_spinner=False)(_new_background_loop)
+            else:
+                _default_loop = _new_background_loop()
+    if _streamlit_loop_factory is not None:
+        return _streamlit_loop_factory()
+    return _default_loop
+
+
+def run_async(coro, timeout=None, relay=None):
+    """
+    Runs a coroutine on the background loop and blocks until it finishes.
+
+    Args:
+        coro: Coroutine to run
+        timeout: Optional maximum number of seconds to wait
+        relay: Optional CallbackRelay whose queued calls are executed on this thread while waiting
+
+    Returns:
+        The coroutine's result; its exceptions are re-raised here
+
+    Raises:
+        concurrent.futures.TimeoutError: If timeout elapses first; the coroutine is cancelled
+    """
+    future = get_background_loop().submit(coro)
+    try:
+        if relay is None:
+            return future.result(timeout)
+        started = time.monotonic()
+        while True:
+            done, _ = concurrent.futures.wait([future], timeout=POLL_INTERVAL)
+            relay.drain()
+            if done:
+                return future.result()
+            if timeout is not None and time.monotonic() - started >= timeout:
+                raise concurrent.futures.TimeoutError(f"Coroutine did not finish within {timeout} seconds")
+    finally:
+        # If the caller is interrupted (e.g. a Streamlit rerun stops the script), don't leave work running
+        if not future.done():
+            future.cancel()
+
+
+_EXHAUSTED = object()
+
+
+async def _next_item(agen):
+    try:
+        return await agen.__anext__()
+    except StopAsyncIteration:
+        return _EXHAUSTED
+
+
+def iterate_async(agen):
+    """
+    Iterates an async generator on the background loop from synchronous code.
+
+    Items are yielded on the calling thread as soon as the generator produces
+    them, so they can be rendered with ordinary Streamlit calls.
+    """
+    try:
+        while True:
+            item = run_async(_next_item(agen))
+            if item is _EXHAUSTED:
+                return
+            yield item
+    finally:
+        run_async(agen.aclose())
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+
+#################################################
+# BATCH DOCUMENTATION
+#################################################
+
+# Non-interactive entry point that clones and documents many repositories in
+# one event loop. Git I/O and AI calls have separate concurrency limits, and a
+# JSON summary of timings, token usage and failures is written at the end.
+#
+# Usage:
+#   python batch_docs.py repos.json --output-root batch_output --git-concurrency 4 --llm-concurrency 8
+#
+# The manifest is either a text file with one repository URL per line, or JSON:
+#   [{"url": "https://github.com/org/repo.git", "name": "repo", "branch": "main",
+#     "mode": "sections", "docs": ["API Reference", "Guides"], "prompt": "...", "incremental": true}, ...]
+
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import argparse
+import traceback
+from ai import GenerationParams, track_usage
+from repo_tools import clone_github_repo, get_local_repo_contents, index_token_counts
+from docs_generation import create_docs_dir
+from map_reduce_docs import generate_map_reduce_documentation
+from incremental_docs import ManifestSummaryCache, load_manifest, save_manifest, stamp_commit
+
+DOC_OPTIONS = ["API Reference", "Examples", "Guides"]
+MODES = ("sections", "marathon")
+DEFAULT_PROMPT = "Generate comprehensive documentation for this repository"
+
+
+def parse_batch_args(argv=None):
+    p = argparse.ArgumentParser(description="Clone and document many repositories without the Streamlit UI")
+    p.add_argument("manifest", help="JSON list of repositories, or a text file with one URL per line")
+    p.add_argument("-o", "--output-root", default="batch_output",
+                   help="directory receiving one <name>/repo and <name>/docs folder per repository")
+    p.add_argument("--summary", default=None,
+                   help="path of the JSON run summary (default: <output-root>/batch_summary.json)")
+    p.add_argument("--git-concurrency", type=int, default=4, help="simultaneous clones/fetches")
+    p.add_argument("--llm-concurrency", type=int, default=8, help="simultaneous AI requests across all repositories")
+    p.add_argument("--mode", choices=MODES, default="sections",
+                   help="'sections' writes index/api/examples/guides pages, 'marathon' writes one map-reduce document")
+    p.add_argument("--docs", nargs="*", default=DOC_OPTIONS, choices=DOC_OPTIONS,
+                   help="documentation sections for 'sections' mode")
+    p.add_argument("--prompt", default=DEFAULT_PROMPT, help="documentation request for 'marathon' mode")
+    p.add_argument("--incremental", action="store_true",
+                   help="only regenerate documentation whose inputs changed since the last run")
+    # Model parameters, same flags as ai.py
+    p.add_argument("-m", "--model",     default="gpt-4o-mini")
+    p.add_argument("-t", "--temp",      type=float, default=0.5, help="temperature")
+    p.add_argument("-p", "--top_p",     type=float, default=0.85)
+    p.add_argument("-k", "--max_tokens",type=int,   default=2048)
+    p.add_argument("--pp",              type=float, default=0.0, help="presence_penalty")
+    p.add_argument("--fp",              type=float, default=0.0, help="frequency_penalty")
+    p.add_argument("--seed",            type=int,   default=None)
+    p.add_argument("--stop",            nargs="*",  default=None,
+                   help="one or more stop strings")
+    return p.parse_args(argv)
+
+
+def repo_name_from_url(url):
+    """Derives a filesystem-safe name from a repository URL, e.g. 'org__repo'."""
+    path = url.rstrip("/").split("://")[-1]
+    if path.endswith(".git"):
+        path = path[:-4]
+    parts = [part for part in re.split(r"[/:]", path) if part]
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", "__".join(parts[-2:])) or "repo"
+
+
+def load_batch_manifest(manifest_path):
+    """
+    Reads the batch manifest and normalizes every entry to a dictionary with at least 'url' and 'name'.
+
+    Raises:
+        ValueError: If the manifest is malformed or names collide
+    """
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        text = f.read()
+
+    try:
+        data = json.loads(text)
+    except ValueError:
+        data = [line.strip() for line in text.splitlines() if line.strip() and not line.strip().startswith("#")]
+    if isinstance(data, dict):
+        data = data.get("repos", [])
+    if not isinstance(data, list):
+        raise ValueError("Manifest must be a list of repositories")
+
+    entries = []
+    seen = set()
+    for item in data:
+        entry = {"url": item} if isinstance(item, str) else dict(item)
+        if not entry.get("url"):
+            raise ValueError(f"Manifest entry without a url: {item!r}")
+        entry.setdefault("name", repo_name_from_url(entry["url"]))
+        if entry["name"] in seen:
+            raise ValueError(f"Duplicate repository name in manifest: {entry['name']}")
+        seen.add(entry["name"])
+        entries.append(entry)
+    return entries
+
+
+def build_model_args(options):
+    """Returns the generation parameters used for every AI call."""
+    return GenerationParams.from_args(options)
+
+
+async def document_repository(entry, options, model_args, git_semaphore, llm_semaphore):
+    """
+    Clones and documents a single repository.
+
+    Returns:
+        dict: Result record with status, timings, token usage and any error
+    """
+    name = entry["name"]
+    base_dir = os.path.abspath(os.path.join(options.output_root, name))
+    repo_dir = os.path.join(base_dir, "repo")
+    docs_dir = os.path.join(base_dir, "docs")
+    mode = entry.get("mode", options.mode)
+    incremental = entry.get("incremental", options.incremental)
+    result = {"name": name, "url": entry["url"], "mode": mode, "status": "ok", "output_dir": docs_dir,
+              "timings": {}, "error": None}
+    # Each repository runs in its own task, so usage is counted per repository
+    result["usage"] = track_usage()
+    start_time = time.perf_counter()
+
+    try:
+        os.makedirs(base_dir, exist_ok=True)
+        async with git_semaphore:
+            step_start = time.perf_counter()
+            await asyncio.to_thread(clone_github_repo, entry["url"], repo_dir=repo_dir, branch=entry.get("branch"))
+            result["timings"]["clone"] = time.perf_counter() - step_start
+
+        step_start = time.perf_counter()
+        if mode == "sections":
+            docs = entry.get("docs", options.docs)
+            await create_docs_dir(
+                api_overview="API Reference" in docs,
+                examples="Examples" in docs,
+                guides="Guides" in docs,
+                output_dir=docs_dir,
+                target_repo_path=repo_dir,
+                incremental=incremental,
+                args_namespace=model_args,
+                semaphore=llm_semaphore
+            )
+        elif mode == "marathon":
+            file_contents, file_index = await asyncio.to_thread(get_local_repo_contents, repo_dir, with_index=True)
+            manifest = load_manifest(docs_dir) if incremental else None
+            summary_cache = ManifestSummaryCache(manifest, model_args) if incremental else None
+            documentation = await generate_map_reduce_documentation(
+                file_contents,
+                entry.get("prompt", options.prompt),
+                model_args,
+                token_counts=index_token_counts(file_index),
+                summary_cache=summary_cache,
+                semaphore=llm_semaphore
+            )
+            os.makedirs(docs_dir, exist_ok=True)
+            with open(os.path.join(docs_dir, "documentation.md"), "w", encoding="utf-8") as f:
+                f.write(documentation)
+            if incremental:
+                summary_cache.commit()
+                stamp_commit(manifest, repo_dir)
+                save_manifest(docs_dir, manifest)
+                result["reused_chunks"] = summary_cache.reused
+        else:
+            raise ValueError(f"Unknown mode: {mode}")
+        result["timings"]["generate"] = time.perf_counter() - step_start
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = f"{type(e).__name__}: {e}"
+        result["traceback"] = traceback.format_exc()
+        print(f"[{name}] failed: {result['error']}")
+
+    result["timings"]["total"] = time.perf_counter() - start_time
+    print(f"[{name}] {result['status']} in {result['timings']['total']:.1f}s")
+    return result
+
+
+async def run_batch(entries, options):
+    """Documents every manifest entry concurrently and returns the run summary."""
+    model_args = build_model_args(options)
+    git_semaphore = asyncio.Semaphore(max(1, options.git_concurrency))
+    llm_semaphore = asyncio.Semaphore(max(1, options.llm_concurrency))
+
+    started = time.time()
+    start_time = time.perf_counter()
+    results = await asyncio.gather(*(
+        document_repository(entry, options, model_args, git_semaphore, llm_semaphore) for entry in entries
+    ))
+
+    totals = {"repositories": len(results),
+              "succeeded": sum(1 for r in results if r["status"] == "ok"),
+              "failed": sum(1 for r in results if r["status"] != "ok")}
+    for key in ("requests", "cache_hits", "prompt_tokens", "completion_tokens"):
+        totals[key] = sum(r["usage"][key] for r in results)
+
+    return {
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started)),
+        "elapsed_seconds": time.perf_counter() - start_time,
+        "options": {"mode": options.mode, "incremental": options.incremental, "model": options.model,
+                    "git_concurrency": options.git_concurrency, "llm_concurrency": options.llm_concurrency},
+        "totals": totals,
+        "repositories": results,
+    }
+
+
+def main(argv=None):
+    options = parse_batch_args(argv)
+    try:
+        entries = load_batch_manifest(options.manifest)
+    except (OSError, ValueError) as e:
+        print(f"Error reading manifest: {e}")
+        return 2
+
+    print(f"Documenting {len(entries)} repositories into {options.output_root}")
+    summary = asyncio.run(run_batch(entries, options))
+
+    summary_path = options.summary or os.path.join(options.output_root, "batch_summary.json")
+    os.makedirs(os.path.dirname(os.path.abspath(summary_path)), exist_ok=True)
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+
+    totals = summary["totals"]
+    print(f"Done: {totals['succeeded']} succeeded, {totals['failed']} failed, "
+          f"{totals['prompt_tokens'] + totals['completion_tokens']:,} tokens in {summary['elapsed_seconds']:.1f}s")
+    print(f"Summary written to {summary_path}")
+    return 1 if totals["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
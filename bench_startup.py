@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+#################################################
+# STARTUP BENCHMARK
+#################################################
+
+# Measures how long the Streamlit app takes to start, each time in a fresh
+# interpreter so nothing is already imported:
+#   - import time of streamlit itself, then of the modules app.py imports
+#   - optionally (--apptest) the first run and a rerun of app.py through
+#     Streamlit's AppTest harness
+# Exits with status 1 if the app modules take longer than --budget-ms to
+# import, or if a heavy dependency that should load lazily is imported eagerly.
+#
+# Usage:
+#   python bench_startup.py --runs 5 --budget-ms 800 --apptest
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+# Modules imported at the top of app.py
+APP_MODULES = ["async_runner", "docs_generation", "ai", "repo_tools", "workspace", "repo_snapshot", "token_counter", "map_reduce_docs", "context_packer", "doc_export"]
+
+# Heavy dependencies that must only be imported when first needed
+LAZY_MODULES = ["pandas", "numpy", "openai", "httpx", "tiktoken", "chardet"]
+
+IMPORT_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import streamlit
+streamlit_ms = (time.perf_counter() - start) * 1000
+start = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+app_ms = (time.perf_counter() - start) * 1000
+print(json.dumps({{"streamlit_ms": streamlit_ms, "app_modules_ms": app_ms,
+                  "eager": [name for name in {lazy!r} if name in sys.modules]}}))
+"""
+
+APPTEST_PROBE = """
+import time, json
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file("app.py", default_timeout=120)
+start = time.perf_counter()
+app.run()
+first_ms = (time.perf_counter() - start) * 1000
+start = time.perf_counter()
+app.run()
+rerun_ms = (time.perf_counter() - start) * 1000
+print(json.dumps({"first_run_ms": first_ms, "rerun_ms": rerun_ms, "exceptions": len(app.exception)}))
+"""
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_probe(code):
+    """Runs probe code in a fresh interpreter from the repository root and returns its JSON output."""
+    result = subprocess.run([sys.executable, "-c", code], cwd=REPO_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Benchmark probe failed:\n{result.stderr}")
+    # The JSON line is the last line; Streamlit may log before it
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def median_of(samples, key):
+    return statistics.median(sample[key] for sample in samples)
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Benchmark Lightning MD cold start")
+    p.add_argument("--runs", type=int, default=5, help="fresh interpreters per measurement")
+    p.add_argument("--budget-ms", type=float, default=800.0,
+                   help="maximum median import time of the app modules, excluding streamlit")
+    p.add_argument("--apptest", action="store_true", help="also time a full run and rerun of app.py")
+    options = p.parse_args(argv)
+
+    code = IMPORT_PROBE.format(modules=APP_MODULES, lazy=LAZY_MODULES)
+    samples = [run_probe(code) for _ in range(max(1, options.runs))]
+    streamlit_ms = median_of(samples, "streamlit_ms")
+    app_ms = median_of(samples, "app_modules_ms")
+    eager = sorted({name for sample in samples for name in sample["eager"]})
+
+    print(f"import streamlit:    {streamlit_ms:8.1f} ms (median of {len(samples)})")
+    print(f"import app modules:  {app_ms:8.1f} ms (budget {options.budget_ms:.0f} ms)")
+    print(f"eagerly imported:    {', '.join(eager) if eager else 'none'}")
+
+    if options.apptest:
+        runs = [run_probe(APPTEST_PROBE) for _ in range(max(1, options.runs))]
+        print(f"app.py first run:    {median_of(runs, 'first_run_ms'):8.1f} ms")
+        print(f"app.py rerun:        {median_of(runs, 'rerun_ms'):8.1f} ms")
+        if any(run["exceptions"] for run in runs):
+            print("Warning: app.py raised exceptions under AppTest")
+
+    failed = False
+    if app_ms > options.budget_ms:
+        print(f"FAIL: app modules import in {app_ms:.1f} ms, over the {options.budget_ms:.0f} ms budget")
+        failed = True
+    if eager:
+        print(f"FAIL: heavy modules imported at startup: {', '.join(eager)}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+#################################################
+# CLONE CACHE
+#################################################
+
+# Local cache of bare repository mirrors keyed by repository URL. A repeat
+# pull only fetches new commits into the cached mirror and then makes a fast
+# local clone of it, instead of cloning from GitHub from scratch.
+
+import os
+import re
+import time
+import shutil
+import hashlib
+import threading
+import subprocess
+
+CLONE_CACHE_DIR = os.environ.get("LIGHTNING_MD_CLONE_CACHE_DIR", os.path.join(".cache", "clones"))
+CLONE_CACHE_MAX_BYTES = 5 * 1024 * 1024 * 1024    # 5 GB of mirrors
+LAST_USED_MARKER = "lightning_md_last_used"
+SIZE_MARKER = "lightning_md_size"                 # Mirror size in bytes, recorded after each update
+
+# One lock per mirror so concurrent pulls of the same repository do not race
+_mirror_locks = {}
+_mirror_locks_guard = threading.Lock()
+
+
+def _mirror_lock(key):
+    with _mirror_locks_guard:
+        return _mirror_locks.setdefault(key, threading.Lock())
+
+
+def _run_git(args, **kwargs):
+    return subprocess.run(["git", *args], check=True, capture_output=True, text=True, **kwargs)
+
+
+def mirror_key(github_url, branch=None, depth=1):
+    """
+    Returns the cache directory name for a repository URL.
+
+    The key keeps a readable slug of the URL and a hash of the normalized URL,
+    branch and history mode, so shallow and full mirrors never share a directory.
+    """
+    normalized = github_url.strip().rstrip("/")
+    if normalized.endswith(".git"):
+        normalized = normalized[:-4]
+    slug = re.sub(r"[^A-Za-z0-9._-]+", "_", normalized.split("://")[-1])[-60:].strip("_")
+    mode = "full" if not depth else f"depth{depth}"
+    digest = hashlib.sha256(f"{normalized}\n{branch or ''}\n{mode}".encode("utf-8")).hexdigest()[:16]
+    return f"{slug}-{digest}"
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def _touch(mirror_path):
+    marker = os.path.join(mirror_path, LAST_USED_MARKER)
+    with open(marker, "a"):
+        pass
+    os.utime(marker, None)
+
+
+def _last_used(mirror_path):
+    try:
+        return os.path.getmtime(os.path.join(mirror_path, LAST_USED_MARKER))
+    except OSError:
+        return 0.0
+
+
+def _record_size(mirror_path):
+    """Measures a mirror once and stores the result next to it for eviction."""
+    size = _dir_size(mirror_path)
+    with open(os.path.join(mirror_path, SIZE_MARKER), "w") as f:
+        f.write(str(size))
+    return size
+
+
+def _recorded_size(mirror_path):
+    """Returns a mirror's recorded size, measuring it only if none was recorded yet."""
+    try:
+        with open(os.path.join(mirror_path, SIZE_MARKER), "r") as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return _record_size(mirror_path)
+
+
+def update_mirror(github_url, branch=None, depth=1, cache_dir=CLONE_CACHE_DIR):
+    """
+    Creates or incrementally updates the cached bare mirror for a repository.
+
+    Args:
+        github_url (str): URL of the repository
+        branch (str): Branch to track, defaults to the remote HEAD
+        depth (int): History depth to keep, None for full history
+        cache_dir (str): Directory holding all mirrors
+
+    Returns:
+        str: Path to the up-to-date bare mirror
+    """
+    key = mirror_key(github_url, branch, depth)
+    mirror_path = os.path.join(cache_dir, key)
+    depth_args = ["--depth", str(depth)] if depth else []
+
+    with _mirror_lock(key):
+        if os.path.isdir(os.path.join(mirror_path, "objects")):
+            print(f"Updating cached mirror of {github_url}...")
+            # Fetch only the tracked branch straight into the mirror's HEAD branch
+            head_ref = _run_git(["-C", mirror_path, "symbolic-ref", "HEAD"]).stdout.strip()
+            source_ref = f"refs/heads/{branch}" if branch else "HEAD"
+            _run_git(["-C", mirror_path, "fetch", "--prune", *depth_args, "origin", f"+{source_ref}:{head_ref}"])
+        else:
+            print(f"Creating cached mirror of {github_url}...")
+            if os.path.exists(mirror_path):
+                shutil.rmtree(mirror_path)
+            os.makedirs(cache_dir, exist_ok=True)
+            source = github_url
+            if depth and os.path.isdir(github_url):
+                source = "file://" + os.path.abspath(github_url)
+            branch_args = ["--branch", branch] if branch else []
+            _run_git(["clone", "--bare", *depth_args, *branch_args, source, mirror_path])
+        _touch(mirror_path)
+        _record_size(mirror_path)
+
+    return mirror_path
+
+
+def checkout_from_mirror(mirror_path, repo_dir, github_url=None):
+    """
+    Materializes a working tree from a cached mirror with a local (hardlinked) clone.
+
+    Args:
+        mirror_path (str): Path to the bare mirror
+        repo_dir (str): Empty or non-existent destination directory
+        github_url (str): If given, set as the clone's origin URL
+    """
+    _run_git(["clone", "--local", "--quiet", mirror_path, repo_dir])
+    if github_url:
+        _run_git(["-C", repo_dir, "remote", "set-url", "origin", github_url])
+
+
+def evict_mirrors(max_bytes=CLONE_CACHE_MAX_BYTES, cache_dir=CLONE_CACHE_DIR, keep=()):
+    """
+    Deletes least recently used mirrors until the cache fits in max_bytes.
+
+    Sizes come from the record update_mirror leaves in each mirror, so
+    eviction doesn't walk every mirror in the cache.
+
+    Args:
+        max_bytes (int): Disk budget for all mirrors together
+        cache_dir (str): Directory holding all mirrors
+        keep (iterable): Mirror paths that must not be evicted
+
+    Returns:
+        list: Paths of the evicted mirrors
+    """
+    if not os.path.isdir(cache_dir):
+        return []
+
+    keep = {os.path.abspath(path) for path in keep}
+    mirrors = []
+    for entry in os.scandir(cache_dir):
+        if entry.is_dir(follow_symlinks=False):
+            mirrors.append((_last_used(entry.path), _recorded_size(entry.path), entry.path))
+
+    total = sum(size for _, size, _ in mirrors)
+    evicted = []
+    for _, size, path in sorted(mirrors):
+        if total <= max_bytes:
+            break
+        if os.path.abspath(path) in keep:
+            continue
+        key = os.path.basename(path)
+        with _mirror_lock(key):
+            shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        evicted.append(path)
+        print(f"Evicted cached mirror {key}")
+    return evicted
+
+
+def mirror_cache_stats(cache_dir=CLONE_CACHE_DIR):
+    """Returns the number of cached mirrors, their total size and the oldest access time."""
+    if not os.path.isdir(cache_dir):
+        return {"mirrors": 0, "bytes": 0, "oldest_last_used": None}
+    paths = [entry.path for entry in os.scandir(cache_dir) if entry.is_dir(follow_symlinks=False)]
+    return {
+        "mirrors": len(paths),
+        "bytes": sum(_recorded_size(path) for path in paths),
+        "oldest_last_used": min((_last_used(path) for path in paths), default=None),
+    }
+
+
+def clone_with_cache(github_url, repo_dir, branch=None, depth=1, max_bytes=CLONE_CACHE_MAX_BYTES, cache_dir=CLONE_CACHE_DIR):
+    """
+    Clones a repository into repo_dir through the mirror cache.
+
+    Returns:
+        str: Path to the mirror that was used
+    """
+    start_time = time.perf_counter()
+    mirror_path = update_mirror(github_url, branch, depth, cache_dir)
+    checkout_from_mirror(mirror_path, repo_dir, github_url)
+    evict_mirrors(max_bytes, cache_dir, keep=[mirror_path])
+    print(f"Checked out {github_url} from cache in {time.perf_counter() - start_time:.2f}s")
+    return mirror_path
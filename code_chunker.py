@@ -0,0 +1,388 @@
+#################################################
+# CODE CHUNKING
+#################################################
+
+# Splits source files on semantic boundaries instead of character or line
+# counts: module-level code, classes and functions via `ast` for Python,
+# brace depth for JavaScript/TypeScript and indentation for everything else.
+# Every chunk carries its token count and a stable ID derived from its path,
+# name and content, so chunks can be cached, budgeted and summarized on their
+# own without prompts ever containing half a function.
+
+import re
+import ast
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from token_counter import count_tokens_batch, content_hash, DEFAULT_MODEL
+
+DEFAULT_MAX_CHUNK_TOKENS = 1024   # Larger definitions are split into their members, then by lines
+DEFAULT_MIN_CHUNK_TOKENS = 128    # Smaller neighbouring chunks are merged
+CHUNK_MEMO_ENTRIES = 4096         # Chunked files kept across calls
+
+LANGUAGES = {
+    '.py': 'python', '.pyi': 'python',
+    '.js': 'javascript', '.jsx': 'javascript', '.mjs': 'javascript', '.cjs': 'javascript',
+    '.ts': 'typescript', '.tsx': 'typescript', '.mts': 'typescript', '.cts': 'typescript',
+    '.md': 'markdown', '.markdown': 'markdown',
+}
+
+JS_DECLARATION = re.compile(
+    r'^(?:export\s+)?(?:default\s+)?(?:declare\s+)?(?:abstract\s+)?(?:async\s+)?'
+    r'(?:function\s*\*?|class|interface|enum|type|namespace|module|const|let|var)\s+([A-Za-z_$][\w$]*)'
+)
+JS_MEMBER = re.compile(
+    r'^\s*(?:(?:static|async|get|set|public|private|protected|readonly|override|abstract|declare)\s+)*'
+    r'\*?\s*(#?[A-Za-z_$][\w$]*)\s*[?!]?\s*[(<:=;]'
+)
+JS_COMMENT_PREFIXES = ('//', '/*', '*', '@')
+INDENT_DEFINITION = re.compile(r'^(?:export\s+|pub\s+|async\s+)*(?:def|class|func|fn|function|sub|module)\s+([A-Za-z_$][\w$]*)')
+MARKDOWN_HEADING = re.compile(r'^#{1,6}\s+(.+)')
+
+
+@dataclass(frozen=True, slots=True)
+class CodeChunk:
+    """
+    One semantically complete piece of a source file.
+
+    Attributes:
+        id: Stable identifier "<path>::<name>@<content hash>", unchanged as long
+            as the chunk's text is unchanged, wherever it moves in the file
+        path: Relative path of the file
+        name: Qualified name of the definitions it holds (e.g. "Repo.load"),
+            "(module)" for module-level code
+        kind: "module", "class", "function", "method", "block", "section",
+              "group" (merged neighbours) or "fragment" (part of an oversized definition)
+        language: "python", "javascript", "typescript", "markdown" or "text"
+        start_line: First line, 1-based
+        end_line: Last line, inclusive
+        text: Source text; the chunks of a file concatenate back to the file
+        tokens: Token count of text
+    """
+    id: str
+    path: str
+    name: str
+    kind: str
+    language: str
+    start_line: int
+    end_line: int
+    text: str
+    tokens: int
+
+
+def language_of(path):
+    """Returns the chunking language for a file path, "text" when no parser applies."""
+    dot = path.rfind('.')
+    return LANGUAGES.get(path[dot:].lower(), 'text') if dot != -1 else 'text'
+
+
+#################################################
+# SEGMENTATION
+#################################################
+
+# A splitter returns segments covering [start, end) of a file's lines as
+# (kind, name, first_line, expand) tuples. Each segment runs up to the next
+# one's first line; expand is None, or a callable returning the segments of
+# the segment's own members for when it is too large to keep whole.
+
+
+def _attach_comments(lines, first, floor, prefixes):
+    """Moves a definition's first line up over the comment lines directly above it."""
+    while first - 1 > floor and lines[first - 1].strip().startswith(prefixes):
+        first -= 1
+    return first
+
+
+def _python_segments(lines, body, start, end, prefix='', header=None):
+    segments = []
+    if header is not None:
+        segments.append(('class', header, start, None))
+    for node in body:
+        first = min([node.lineno] + [d.lineno for d in getattr(node, 'decorator_list', [])]) - 1
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            floor = segments[-1][2] if segments else start - 1
+            first = max(_attach_comments(lines, first, floor, ('#',)), start)
+            name = prefix + node.name
+            if isinstance(node, ast.ClassDef):
+                expand = (lambda s, e, node=node, name=name:
+                          _python_segments(lines, node.body, s, e, name + '.', header=name))
+                segments.append(('class', name, first, expand))
+            else:
+                segments.append(('method' if prefix else 'function', name, first, None))
+        elif not segments or segments[-1][3] is not None or segments[-1][0] in ('function', 'method'):
+            # A run of plain statements: imports, constants, top-level calls
+            segments.append(('class' if prefix else 'module', prefix.rstrip('.') or '(module)', max(first, start), None))
+    return segments
+
+
+def _js_depths(lines):
+    """Returns the bracket depth at the start of every line, skipping strings and comments."""
+    depths = []
+    depth = 0
+    in_block_comment = False
+    quote = None
+    for line in lines:
+        depths.append(depth)
+        i = 0
+        length = len(line)
+        while i < length:
+            char = line[i]
+            if in_block_comment:
+                if line.startswith('*/', i):
+                    in_block_comment = False
+                    i += 1
+            elif quote:
+                if char == '\\':
+                    i += 1
+                elif char == quote:
+                    quote = None
+            elif line.startswith('//', i):
+                break
+            elif line.startswith('/*', i):
+                in_block_comment = True
+                i += 1
+            elif char in '\'"`':
+                quote = char
+            elif char in '([{':
+                depth += 1
+            elif char in ')]}':
+                depth = max(0, depth - 1)
+            i += 1
+        if quote in ('"', "'"):
+            # Unterminated single-line string: don't let it swallow the rest of the file
+            quote = None
+    return depths
+
+
+def _js_segments(lines, depths, start, end, depth=0, header=None):
+    segments = []
+    if header is not None:
+        segments.append(('class', header, start, None))
+    prefix = header + '.' if header else ''
+    for index in range(start, end):
+        line = lines[index]
+        stripped = line.strip()
+        if not stripped or depths[index] != depth or stripped[0] in ')]}.,':
+            continue
+        if depth == 0:
+            if line[0].isspace():
+                continue
+            match = JS_DECLARATION.match(stripped)
+        else:
+            match = JS_MEMBER.match(line)
+        if match is None:
+            if stripped.startswith(JS_COMMENT_PREFIXES) or (segments and segments[-1][1] == (header or '(module)')):
+                continue
+            segments.append(('class' if header else 'module', header or '(module)', index, None))
+            continue
+        floor = segments[-1][2] if segments else start - 1
+        first = max(_attach_comments(lines, index, floor, JS_COMMENT_PREFIXES), start)
+        name = prefix + match.group(1)
+        if depth == 0 and re.match(r'^(?:export\s+)?(?:default\s+)?(?:abstract\s+)?class\s', stripped):
+            expand = lambda s, e, name=name: _js_segments(lines, depths, s, e, depth + 1, header=name)
+            segments.append(('class', name, first, expand))
+        else:
+            segments.append(('method' if depth else 'function', name, first, None))
+    return segments
+
+
+def _indent_segments(lines, start, end, headings=False):
+    segments = []
+    previous_blank = True
+    in_fence = False
+    for index in range(start, end):
+        line = lines[index]
+        stripped = line.strip()
+        if not stripped:
+            previous_blank = True
+            continue
+        if headings and stripped.startswith('```'):
+            in_fence = not in_fence
+        heading = MARKDOWN_HEADING.match(line) if headings and not in_fence else None
+        definition = INDENT_DEFINITION.match(line)
+        if heading or definition or (previous_blank and not line[0].isspace()):
+            if heading:
+                segments.append(('section', heading.group(1).strip(), index, None))
+            elif definition:
+                segments.append(('function', definition.group(1), index, None))
+            else:
+                segments.append(('block', stripped[:40], index, None))
+        previous_blank = False
+    return segments
+
+
+def _split_segments(language, lines):
+    if language == 'python':
+        try:
+            tree = ast.parse(''.join(lines))
+        except (SyntaxError, ValueError):
+            return _indent_segments(lines, 0, len(lines))
+        return _python_segments(lines, tree.body, 0, len(lines))
+    if language in ('javascript', 'typescript'):
+        return _js_segments(lines, _js_depths(lines), 0, len(lines))
+    return _indent_segments(lines, 0, len(lines), headings=language == 'markdown')
+
+
+def _ranges(segments, start, end):
+    """Turns segments into (kind, name, start, end, expand), each ending where the next begins."""
+    ranges = []
+    for i, (kind, name, first, expand) in enumerate(segments):
+        first = start if i == 0 else first
+        last = segments[i + 1][2] if i + 1 < len(segments) else end
+        if last > first:
+            ranges.append((kind, name, first, last, expand))
+    if not ranges:
+        ranges.append(('block', '(file)', start, end, None))
+    return ranges
+
+
+def _split_lines(kind, name, lines, start, end, line_tokens, max_tokens):
+    """Cuts an oversized definition into fragments, preferring blank lines as cut points."""
+    pieces = []
+    piece_start, piece_tokens, last_blank = start, 0, None
+    for index in range(start, end):
+        tokens = line_tokens[index - start]
+        if piece_tokens and piece_tokens + tokens > max_tokens:
+            cut = last_blank if last_blank is not None and last_blank > piece_start else index
+            pieces.append((piece_start, cut))
+            piece_tokens = sum(line_tokens[cut - start:index - start])
+            piece_start, last_blank = cut, None
+        piece_tokens += tokens
+        if not lines[index].strip():
+            last_blank = index + 1
+    pieces.append((piece_start, end))
+    if len(pieces) == 1:
+        return [(kind, name, start, end)]
+    return [('fragment', f"{name} (part {n})", s, e) for n, (s, e) in enumerate(pieces, start=1)]
+
+
+def _leaves(lines, segments, start, end, max_tokens, model):
+    """Recursively expands or line-splits segments until each fits in max_tokens."""
+    ranges = _ranges(segments, start, end)
+    counts = count_tokens_batch([''.join(lines[s:e]) for _, _, s, e, _ in ranges], model)
+    leaves = []
+    for (kind, name, s, e, expand), tokens in zip(ranges, counts):
+        if tokens <= max_tokens:
+            leaves.append((kind, name, s, e, tokens))
+            continue
+        if expand is not None:
+            children = expand(s, e)
+            if len(children) > 1:
+                leaves.extend(_leaves(lines, children, s, e, max_tokens, model))
+                continue
+        line_tokens = count_tokens_batch(lines[s:e], model)
+        for piece in _split_lines(kind, name, lines, s, e, line_tokens, max_tokens):
+            piece_tokens = sum(line_tokens[piece[2] - s:piece[3] - s])
+            leaves.append(piece + (piece_tokens,))
+    return leaves
+
+
+def _merge_small(leaves, max_tokens, min_tokens):
+    """Merges runs of neighbouring small leaves while they stay within max_tokens."""
+    groups = []
+    for leaf in leaves:
+        if groups:
+            current = groups[-1]
+            current_tokens = sum(item[4] for item in current)
+            if current_tokens < min_tokens and current_tokens + leaf[4] <= max_tokens:
+                current.append(leaf)
+                continue
+            if leaf[4] < min_tokens and current_tokens + leaf[4] <= max_tokens and current[-1][4] < min_tokens:
+                current.append(leaf)
+                continue
+        groups.append([leaf])
+    return groups
+
+
+#################################################
+# PUBLIC API
+#################################################
+
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def chunk_file(path, text, max_tokens=DEFAULT_MAX_CHUNK_TOKENS, min_tokens=DEFAULT_MIN_CHUNK_TOKENS, model=DEFAULT_MODEL):
+    """
+    Splits one file into CodeChunks on semantic boundaries.
+
+    Top-level definitions become chunks of their own (decorators and the
+    comments directly above them included). Classes larger than max_tokens
+    are split into their header and members; anything still too large is
+    cut into fragments at blank lines. Neighbouring chunks smaller than
+    min_tokens are merged. Results are memoized by path and content.
+
+    Args:
+        path: Relative path of the file, used for the language and chunk IDs
+        text: File contents
+        max_tokens: Target upper bound on chunk size; only a single line
+            larger than this can exceed it
+        min_tokens: Chunks below this size are merged with their neighbours
+        model: Model whose tokenizer is used for counting
+
+    Returns:
+        list: CodeChunks in file order
+    """
+    key = (path, content_hash(text), max_tokens, min_tokens, model)
+    with _memo_lock:
+        chunks = _memo.get(key)
+        if chunks is not None:
+            _memo.move_to_end(key)
+            return list(chunks)
+
+    language = language_of(path)
+    lines = text.splitlines(keepends=True)
+    chunks = []
+    if lines:
+        leaves = _leaves(lines, _split_segments(language, lines), 0, len(lines), max_tokens, model)
+        groups = _merge_small(leaves, max_tokens, min_tokens)
+        texts = [''.join(lines[group[0][2]:group[-1][3]]) for group in groups]
+        counts = count_tokens_batch(texts, model)
+        seen = {}
+        for group, chunk_text, tokens in zip(groups, texts, counts):
+            if len(group) == 1:
+                kind, name = group[0][0], group[0][1]
+            else:
+                names = list(dict.fromkeys(item[1] for item in group))
+                kind = 'group'
+                name = ', '.join(names) if len(names) <= 3 else f"{names[0]} … {names[-1]}"
+            chunk_id = f"{path}::{name}@{content_hash(chunk_text)[:12]}"
+            seen[chunk_id] = seen.get(chunk_id, 0) + 1
+            if seen[chunk_id] > 1:
+                # Identical text under the same name, e.g. repeated boilerplate
+                chunk_id = f"{chunk_id}~{seen[chunk_id]}"
+            chunks.append(CodeChunk(chunk_id, path, name, kind, language,
+                                    group[0][2] + 1, group[-1][3], chunk_text, tokens))
+
+    with _memo_lock:
+        _memo[key] = tuple(chunks)
+        while len(_memo) > CHUNK_MEMO_ENTRIES:
+            _memo.popitem(last=False)
+    return chunks
+
+
+def chunk_files(file_contents, max_tokens=DEFAULT_MAX_CHUNK_TOKENS, min_tokens=DEFAULT_MIN_CHUNK_TOKENS, model=DEFAULT_MODEL):
+    """
+    Chunks every file of a {path: content} mapping.
+
+    Returns:
+        dict: Mapping of path to its list of CodeChunks
+    """
+    return {path: chunk_file(path, file_contents[path], max_tokens, min_tokens, model) for path in file_contents}
+
+
+def leading_chunks(path, text, max_tokens, model=DEFAULT_MODEL):
+    """
+    Returns the longest run of whole chunks from the start of a file that fits in max_tokens.
+
+    Used to shorten files for a token budget without cutting a definition in
+    half. Returns an empty string when not even the first chunk fits.
+    """
+    parts = []
+    used = 0
+    for chunk in chunk_file(path, text, min(max_tokens, DEFAULT_MAX_CHUNK_TOKENS), model=model):
+        if used + chunk.tokens > max_tokens:
+            break
+        parts.append(chunk.text)
+        used += chunk.tokens
+    return ''.join(parts)
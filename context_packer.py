@@ -0,0 +1,220 @@
+#################################################
+# CONTEXT PACKER
+#################################################
+
+# Fills a token budget with repository content, most important files first.
+# Files that do not fit in full are cut to the whole functions and classes
+# that fit in the remaining space or reduced to a one-line summary, so every
+# request stays within its limit.
+
+import os
+import re
+from token_counter import count_tokens
+from code_chunker import leading_chunks
+
+DEFAULT_CONTEXT_BUDGET = 50000    # Tokens of repository context per request
+MIN_TRUNCATED_TOKENS = 256        # Don't bother including smaller partial files
+
+ENTRY_POINT_NAMES = {
+    'main.py', '__main__.py', 'app.py', 'cli.py', 'manage.py', 'server.py', 'wsgi.py', 'asgi.py',
+    'index.js', 'index.ts', 'main.js', 'main.ts', 'app.js', 'app.ts', 'server.js', 'server.ts',
+    'main.go', 'main.rs', 'lib.rs', 'Main.java', 'Program.cs',
+}
+MANIFEST_NAMES = {
+    'setup.py', 'pyproject.toml', 'setup.cfg', 'requirements.txt', 'package.json',
+    'Cargo.toml', 'go.mod', 'pom.xml', 'build.gradle', 'Dockerfile', 'Makefile',
+}
+LOW_VALUE_NAMES = {
+    'package-lock.json', 'yarn.lock', 'pnpm-lock.yaml', 'poetry.lock', 'Cargo.lock',
+    'Pipfile.lock', 'composer.lock', 'go.sum',
+}
+CODE_EXTENSIONS = {
+    '.py', '.js', '.jsx', '.ts', '.tsx', '.go', '.rs', '.java', '.kt', '.rb', '.php',
+    '.c', '.cc', '.cpp', '.h', '.hpp', '.cs', '.swift', '.scala',
+}
+DOC_EXTENSIONS = {'.md', '.rst', '.txt'}
+
+
+def file_importance(rel_path):
+    """
+    Scores how useful a file is for documenting the repository (higher is better).
+
+    README files come first, then entry points, package manifests and public
+    API modules. Tests, generated files and lockfiles rank last; within a class
+    shallower files rank above deeply nested ones.
+    """
+    parts = rel_path.replace(os.sep, '/').split('/')
+    name = parts[-1]
+    depth = len(parts) - 1
+    _, ext = os.path.splitext(name)
+    lowered = rel_path.lower()
+
+    if name in LOW_VALUE_NAMES or name.endswith('.min.js') or name.endswith('.map'):
+        score = 0
+    elif name.upper().startswith('README'):
+        score = 100 if depth == 0 else 60
+    elif name in ENTRY_POINT_NAMES:
+        score = 90
+    elif name in MANIFEST_NAMES:
+        score = 80
+    elif name == '__init__.py' or '/api/' in f"/{lowered}" or name.startswith(('api.', 'public.')):
+        score = 75
+    elif ext in CODE_EXTENSIONS:
+        score = 60
+    elif ext in DOC_EXTENSIONS:
+        score = 45
+    else:
+        score = 25
+
+    # Tests and examples are useful, but less so than the code they exercise
+    if re.search(r'(^|/)(tests?|__tests__|spec|fixtures?)(/|$)', lowered) or re.match(r'(test_.*|.*_test\.\w+|.*\.(test|spec)\.\w+)$', name):
+        score -= 30
+    elif re.search(r'(^|/)(examples?|samples?|demo)(/|$)', lowered):
+        score -= 10
+
+    return score - min(depth, 10) * 2
+
+
+def summarize_file(rel_path, content):
+    """
+    Builds a cheap one-line summary of a file without calling the AI.
+
+    Lists top-level definitions for code files, otherwise uses the first
+    meaningful line.
+    """
+    line_count = content.count('\n') + (1 if content and not content.endswith('\n') else 0)
+    _, ext = os.path.splitext(rel_path)
+
+    names = []
+    if ext == '.py':
+        names = re.findall(r'^(?:async\s+)?(?:def|class)\s+(\w+)', content, re.MULTILINE)
+    elif ext in ('.js', '.jsx', '.ts', '.tsx'):
+        names = re.findall(
+            r'^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?(?:function\*?|class|interface|type|const|let)\s+(\w+)',
+            content, re.MULTILINE)
+    elif ext in CODE_EXTENSIONS:
+        names = re.findall(r'^\s*(?:pub\s+|public\s+|export\s+)?(?:fn|func|class|struct|interface|def)\s+(\w+)', content, re.MULTILINE)
+
+    if names:
+        shown = ', '.join(names[:12]) + (f" (+{len(names) - 12} more)" if len(names) > 12 else '')
+        return f"{line_count} lines; defines {shown}"
+
+    for line in content.splitlines():
+        line = line.strip().lstrip('#/*-> ').strip()
+        if line:
+            return f"{line_count} lines; {line[:120]}"
+    return f"{line_count} lines"
+
+
+def pack_context(files, token_budget=DEFAULT_CONTEXT_BUDGET, format_block=None, token_counts=None, model="gpt-4o-mini"):
+    """
+    Selects and formats repository files to fill a token budget as fully as possible.
+
+    Every file first gets a one-line summary (in importance order, while the
+    budget allows). Files are then upgraded to their full content, most
+    important first, whenever the extra tokens still fit; when a file does
+    not fit in full, its leading functions and classes are included, whole,
+    if enough budget remains.
+
+    Args:
+        files: Dictionary mapping relative file paths to their contents
+        token_budget: Maximum number of tokens the packed context may use
+        format_block: Callable(path, content, truncated) returning the text block for a file
+        token_counts: Optional dictionary of precomputed token counts per path
+        model: Model whose tokenizer is used for counting
+
+    Returns:
+        dict: 'full', 'truncated' and 'summaries' as lists of (path, text) tuples in
+        importance order, 'omitted' paths and 'tokens_used'
+    """
+    if format_block is None:
+        format_block = default_block
+    token_counts = token_counts or {}
+
+    ranked = sorted(files, key=lambda path: (-file_importance(path), path))
+    remaining = token_budget
+
+    # Pass 1: one summary line per file, most important first
+    summaries = {}
+    omitted = []
+    for path in ranked:
+        line = f"- {path}: {summarize_file(path, files[path])}\n"
+        cost = count_tokens(line, model)
+        if cost <= remaining:
+            summaries[path] = (line, cost)
+            remaining -= cost
+        else:
+            omitted.append(path)
+
+    # Pass 2: upgrade summaries to full or truncated content while the budget allows
+    full, truncated = [], []
+    for path in ranked:
+        if path not in summaries:
+            continue
+        content = files[path]
+        summary_cost = summaries[path][1]
+        block = format_block(path, content, False)
+        if path in token_counts:
+            # Precomputed counts cover the content only; add the block's wrapper
+            cost = token_counts[path] + count_tokens(format_block(path, '', False), model)
+        else:
+            cost = count_tokens(block, model)
+
+        if cost - summary_cost <= remaining:
+            full.append((path, block))
+            remaining -= cost - summary_cost
+            del summaries[path]
+        elif remaining + summary_cost >= MIN_TRUNCATED_TOKENS:
+            available = remaining + summary_cost - count_tokens(format_block(path, '', True), model)
+            # Cut between definitions; fall back to whole lines when the first one is too large
+            head = leading_chunks(path, content, available, model) or truncate_to_tokens(content, available, model)
+            if head:
+                block = format_block(path, head, True)
+                truncated.append((path, block))
+                remaining -= count_tokens(block, model) - summary_cost
+                del summaries[path]
+
+    return {
+        'full': full,
+        'truncated': truncated,
+        'summaries': [(path, line) for path, (line, _) in summaries.items()],
+        'omitted': omitted,
+        'tokens_used': token_budget - remaining,
+    }
+
+
+def truncate_to_tokens(text, max_tokens, model="gpt-4o-mini"):
+    """Returns the longest prefix of text, cut at a line boundary, that fits in max_tokens."""
+    if max_tokens <= 0:
+        return ""
+    lines = text.splitlines(keepends=True)
+    # Binary search on the number of whole lines that fit
+    low, high = 0, len(lines)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if count_tokens(''.join(lines[:mid]), model) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    return ''.join(lines[:low])
+
+
+def default_block(path, content, truncated):
+    """Default file block used in prompts."""
+    block = f"--- BEGIN {path} ---\n{content}"
+    if not content.endswith('\n'):
+        block += "\n"
+    if truncated:
+        block += "... (file truncated to fit the token budget)\n"
+    return block + f"--- END {path} ---\n\n"
+
+
+def render_packed_context(packed):
+    """Joins a pack_context result into prompt text: file contents, then summaries."""
+    parts = [block for _, block in packed['full'] + packed['truncated']]
+    if packed['summaries']:
+        parts.append("SUMMARIES OF FILES NOT INCLUDED IN FULL:\n")
+        parts.extend(line for _, line in packed['summaries'])
+    if packed['omitted']:
+        parts.append(f"\n({len(packed['omitted'])} more files omitted to stay within the token budget)\n")
+    return ''.join(parts)
@@ -0,0 +1,178 @@
+#################################################
+# DOCUMENTATION EXPORT
+#################################################
+
+# Builds downloadable documentation packages (ZIP, tar.gz or one bundled
+# Markdown file) by streaming files from disk into a temporary file with
+# compression. Packages are cached on disk under a hash of their inputs, so
+# a Streamlit rerun with unchanged documentation reuses the finished file.
+
+import os
+import io
+import time
+import shutil
+import hashlib
+import tarfile
+import zipfile
+import tempfile
+import threading
+
+EXPORT_CACHE_DIR = os.environ.get("LIGHTNING_MD_EXPORT_DIR", os.path.join(".cache", "exports"))
+EXPORT_CACHE_MAX_BYTES = 512 * 1024 * 1024    # Cached packages kept on disk
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# format: (file suffix, MIME type)
+EXPORT_FORMATS = {
+    "zip": (".zip", "application/zip"),
+    "tar.gz": (".tar.gz", "application/gzip"),
+    "md": (".md", "text/markdown"),
+}
+
+# Content hashes of docs files, keyed on (path, size, mtime) so unchanged files are not re-read
+_file_hashes = {}
+_file_hashes_lock = threading.Lock()
+
+
+def _file_hash(file_path):
+    stat = os.stat(file_path)
+    key = (file_path, stat.st_size, stat.st_mtime_ns)
+    with _file_hashes_lock:
+        cached = _file_hashes.get(key)
+    if cached is not None:
+        return cached
+
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    with _file_hashes_lock:
+        _file_hashes[key] = digest.hexdigest()
+    return _file_hashes[key]
+
+
+def list_docs_files(docs_dir):
+    """
+    Lists the files of a docs directory as (archive path, absolute path), sorted.
+
+    Hidden files such as the incremental-generation manifest are left out.
+    """
+    files = []
+    if not docs_dir or not os.path.isdir(docs_dir):
+        return files
+    for root, dirs, names in os.walk(docs_dir):
+        dirs[:] = [name for name in dirs if not name.startswith('.')]
+        for name in names:
+            if name.startswith('.'):
+                continue
+            file_path = os.path.join(root, name)
+            rel_path = os.path.relpath(file_path, docs_dir).replace(os.sep, '/')
+            files.append((f"docs/{rel_path}", file_path))
+    files.sort()
+    return files
+
+
+def export_key(fmt, main_filename, main_content, docs_files):
+    """Hashes everything that determines a package's bytes: format, names and contents."""
+    digest = hashlib.sha256()
+    digest.update(f"{fmt}\0{main_filename}\0".encode('utf-8'))
+    digest.update(main_content.encode('utf-8', 'surrogatepass'))
+    for arcname, file_path in docs_files:
+        digest.update(f"\0{arcname}\0{_file_hash(file_path)}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _write_zip(out, main_filename, main_content, docs_files):
+    with zipfile.ZipFile(out, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(main_filename, main_content)
+        for arcname, file_path in docs_files:
+            # ZipFile.write streams the file in blocks
+            archive.write(file_path, arcname)
+
+
+def _write_tar_gz(out, main_filename, main_content, docs_files):
+    with tarfile.open(fileobj=out, mode='w:gz') as archive:
+        data = main_content.encode('utf-8')
+        info = tarfile.TarInfo(main_filename)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        archive.addfile(info, io.BytesIO(data))
+        for arcname, file_path in docs_files:
+            archive.add(file_path, arcname, recursive=False)
+
+
+def _write_markdown_bundle(out, main_filename, main_content, docs_files):
+    out.write(main_content.encode('utf-8'))
+    for arcname, file_path in docs_files:
+        if not arcname.endswith('.md'):
+            continue
+        out.write(f"\n\n---\n\n<!-- {arcname} -->\n\n".encode('utf-8'))
+        with open(file_path, 'rb') as f:
+            shutil.copyfileobj(f, out)
+
+
+WRITERS = {
+    "zip": _write_zip,
+    "tar.gz": _write_tar_gz,
+    "md": _write_markdown_bundle,
+}
+
+
+def build_export(main_filename, main_content, docs_dir=None, fmt="zip", cache_dir=EXPORT_CACHE_DIR):
+    """
+    Returns the path of a documentation package, building it only if no package
+    with identical inputs is cached.
+
+    Args:
+        main_filename: Name of the main documentation file inside the package
+        main_content: Markdown of the main documentation
+        docs_dir: Optional generated docs directory, packaged under docs/
+        fmt: "zip", "tar.gz" or "md" (main file followed by every docs Markdown file)
+        cache_dir: Directory holding cached packages
+
+    Returns:
+        str: Path of the package file
+    """
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    docs_files = list_docs_files(docs_dir)
+    key = export_key(fmt, main_filename, main_content, docs_files)
+    path = os.path.join(cache_dir, key + EXPORT_FORMATS[fmt][0])
+    if os.path.exists(path):
+        os.utime(path, None)
+        return path
+
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            WRITERS[fmt](out, main_filename, main_content, docs_files)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    evict_exports(cache_dir)
+    return path
+
+
+def evict_exports(cache_dir=EXPORT_CACHE_DIR, max_bytes=EXPORT_CACHE_MAX_BYTES):
+    """Removes the least recently used packages until the cache fits in max_bytes."""
+    entries = []
+    try:
+        with os.scandir(cache_dir) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+    except OSError:
+        return
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
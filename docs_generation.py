@@ -1,18 +1,44 @@
 import os
 import argparse
 import asyncio
-import glob
+import fnmatch
 from pathlib import Path
-from ai import get_ai_response, ARGS, SYSTEM
+from ai import get_ai_response, DEFAULT_PARAMS, SYSTEM
+from async_runner import run_async
+from token_counter import count_tokens, count_file_tokens
+from context_packer import pack_context, render_packed_context, DEFAULT_CONTEXT_BUDGET
+from repo_tools import build_file_index, index_token_counts
+from incremental_docs import (load_manifest, save_manifest, inputs_fingerprint,
+                              params_fingerprint, section_is_current, record_section, stamp_commit)
+from ignore_rules import IgnoreRules, DEFAULT_IGNORE_PATTERNS, walk_repo
 
-def scan_repository(repo_path, max_files=50, ignored_dirs=('docs', '.git', '__pycache__', 'venv', '.venv', 'node_modules')):
+# File name patterns in priority order (code files first, documentation last)
+FILE_PATTERNS = [
+    '*.py', '*.js', '*.jsx', '*.ts', '*.tsx', # Code files first
+    '*.html', '*.css', '*.scss', '*.json',    # Web/config files
+    '*.md', '*.txt', 'README*'                # Documentation
+]
+
+def file_priority(filename):
+    """Return the index of the first pattern in FILE_PATTERNS matching filename, or None."""
+    for priority, pattern in enumerate(FILE_PATTERNS):
+        if fnmatch.fnmatch(filename, pattern):
+            return priority
+    return None
+
+def scan_repository(repo_path, max_files=50, ignored_dirs=('docs', '.git', '__pycache__', 'venv', '.venv', 'node_modules'), use_gitignore=True):
     """
     Scan repository and extract code content from files.
     
+    The tree is walked once; matching files are bucketed by priority class
+    (root README first, then FILE_PATTERNS order) and the highest-priority
+    files are read until max_files is reached.
+    
     Args:
         repo_path: Path to the repository
         max_files: Maximum number of files to process (to prevent token limits)
-        ignored_dirs: Directories to ignore
+        ignored_dirs: Directory names to prune at any depth
+        use_gitignore: If True, also apply the repository's own .gitignore rules
     
     Returns:
         dict: A dictionary with file structure and content
@@ -23,74 +49,54 @@ def scan_repository(repo_path, max_files=50, ignored_dirs=('docs', '.git', '__py
         'file_count': 0
     }
     
-    # Get all non-binary files, sorted by importance
-    file_extensions = [
-        '*.py', '*.js', '*.jsx', '*.ts', '*.tsx', # Code files first
-        '*.html', '*.css', '*.scss', '*.json',    # Web/config files
-        '*.md', '*.txt', 'README*'                # Documentation
-    ]
+    # Bucket every candidate file by priority class in one walk
+    readme_files = []
+    buckets = [[] for _ in FILE_PATTERNS]
+    ignore_rules = IgnoreRules.for_repo(
+        repo_path,
+        extra_patterns=list(DEFAULT_IGNORE_PATTERNS) + [f"{name}/" for name in ignored_dirs],
+        use_gitignore=use_gitignore
+    )
+    for rel_path, filepath in walk_repo(repo_path, ignore_rules, nested_gitignores=use_gitignore):
+        filename = os.path.basename(filepath)
+        priority = file_priority(filename)
+        if priority is None:
+            continue
+        # A README at the repository root is always read first
+        if fnmatch.fnmatch(filename, 'README*') and os.path.dirname(rel_path) == '':
+            readme_files.append((rel_path, filepath))
+        else:
+            buckets[priority].append((rel_path, filepath))
     
-    # Track files we've already found to avoid duplicates
-    found_files = set()
+    all_files = readme_files + [item for bucket in buckets for item in bucket]
     
-    # First, check if there's a README file and prioritize it
-    readme_files = glob.glob(f"{repo_path}/README*")
-    for readme in readme_files:
+    # Read the highest-priority files up to max_files
+    for rel_path, filepath in all_files:
         if repo_structure['file_count'] >= max_files:
             break
-            
-        rel_path = os.path.relpath(readme, repo_path)
         try:
-            with open(readme, 'r', encoding='utf-8', errors='replace') as f:
+            with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
                 content = f.read()
                 repo_structure['files'][rel_path] = content
                 repo_structure['file_count'] += 1
-                found_files.add(os.path.abspath(readme))
         except Exception as e:
             repo_structure['summary'][rel_path] = f"Error reading file: {str(e)}"
     
-    # Then look for specific extensions in priority order
-    for ext in file_extensions:
-        if repo_structure['file_count'] >= max_files:
-            break
-            
-        for filepath in glob.glob(f"{repo_path}/**/{ext}", recursive=True):
-            # Skip files in ignored directories
-            if any(ignored in filepath for ignored in ignored_dirs):
-                continue
-                
-            # Skip files we already processed
-            abs_path = os.path.abspath(filepath)
-            if abs_path in found_files:
-                continue
-                
-            if repo_structure['file_count'] >= max_files:
-                break
-                
-            rel_path = os.path.relpath(filepath, repo_path)
-            try:
-                with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
-                    content = f.read()
-                    repo_structure['files'][rel_path] = content
-                    repo_structure['file_count'] += 1
-                    found_files.add(abs_path)
-            except Exception as e:
-                repo_structure['summary'][rel_path] = f"Error reading file: {str(e)}"
+    # Per-file size, line and token index so consumers don't re-measure content
+    repo_structure['index'] = build_file_index(repo_structure['files'])
     
     # Add information about total files in repo
-    all_files = set()
-    for ext in file_extensions:
-        for filepath in glob.glob(f"{repo_path}/**/{ext}", recursive=True):
-            if not any(ignored in filepath for ignored in ignored_dirs):
-                all_files.add(filepath)
-    
     repo_structure['total_files'] = len(all_files)
     repo_structure['analyzed_percentage'] = (repo_structure['file_count'] / len(all_files) * 100) if all_files else 100
     
     return repo_structure
 
-def format_repository_context(repo_data):
-    """Format repository content into a readable context for the AI."""
+def format_repository_context(repo_data, token_budget=DEFAULT_CONTEXT_BUDGET):
+    """Format repository content into a readable context for the AI.
+    
+    File contents are packed into token_budget tokens, most important files
+    first; files that don't fit are truncated or summarized.
+    """
     context = "REPOSITORY OVERVIEW:\n\n"
     
     # Add metadata
@@ -103,30 +109,114 @@ def format_repository_context(repo_data):
         context += f"- {filename}\n"
     context += "\n"
     
-    # Add file content
+    # Add file content, leaving room for the overview above
     context += "FILE CONTENTS:\n\n"
-    for filename, content in repo_data['files'].items():
-        context += f"--- BEGIN {filename} ---\n"
-        # Limit each file to ~5000 chars to prevent token overflow
-        if len(content) > 5000:
-            context += content[:5000] + "\n... (file truncated due to size)\n"
-        else:
-            context += content + "\n"
-        context += f"--- END {filename} ---\n\n"
+    if 'index' in repo_data:
+        token_counts = index_token_counts(repo_data['index'])
+    else:
+        token_counts = count_file_tokens(repo_data['files'])
+    packed = pack_context(repo_data['files'], max(0, token_budget - count_tokens(context)),
+                          token_counts=token_counts)
+    context += render_packed_context(packed)
     
     return context
 
+# Relative output path and prompt instructions for each generated section
+DOC_SECTIONS = {
+    "index": ("index.md", """Generate a main index page for documentation of this repository.
+    Use the following repository content as context for generating accurate documentation:
+    
+    {repo_context}
+    
+    The index page should serve as a landing page that introduces the project and links to the different documentation sections.
+    Include a brief overview of the project and its purpose based on the actual code and structure."""),
+    "api": (os.path.join("api", "overview.md"), """Generate comprehensive API documentation overview for this repository.
+        Use the following repository content as context for generating accurate documentation:
+        
+        {repo_context}
+        
+        Include information about the main modules, classes, and functions found in the actual code.
+        Focus on explaining how to use the API, parameters, return values, and provide code examples where appropriate.
+        Organize the content with clear headings and sections."""),
+    "examples": (os.path.join("examples", "overview.md"), """Generate practical code examples for this repository.
+        Use the following repository content as context:
+        
+        {repo_context}
+        
+        Based on the ACTUAL code in the repository, include real-world usage scenarios showing how to use the main features.
+        Make sure examples are complete, well-commented, and demonstrate best practices.
+        Start with simple examples and progress to more complex ones.
+        The examples should be directly based on the actual code structure and API found in the repository."""),
+    "guides": (os.path.join("guides", "overview.md"), """Generate comprehensive guides for this repository.
+        Use the following repository content as context:
+        
+        {repo_context}
+        
+        Based on the ACTUAL code in the repository, create detailed tutorials that walk users through different aspects of using the project.
+        Include step-by-step instructions, explanations of concepts, and best practices.
+        Focus on common use cases and potential challenges users might face based on the actual code implementation."""),
+}
+
+async def generate_section(section, repo_context, output_dir, semaphore, args_namespace=None):
+    """Generate a single documentation section and write it to disk as soon as it is ready.
+    
+    Args:
+        section: Key into DOC_SECTIONS ("index", "api", "examples" or "guides")
+        repo_context: Formatted repository context passed to the AI
+        output_dir: Directory where documentation will be stored
+        semaphore: asyncio.Semaphore bounding the number of in-flight AI calls
+        args_namespace: Model parameters (ai.GenerationParams), defaults to ai.DEFAULT_PARAMS
+        
+    Returns:
+        str: Path of the written file
+    """
+    rel_path, prompt_template = DOC_SECTIONS[section]
+    section_path = os.path.join(output_dir, rel_path)
+    os.makedirs(os.path.dirname(section_path), exist_ok=True)
+    
+    async with semaphore:
+        print(f"Generating {rel_path}...")
+        content = await get_ai_response(prompt_template.format(repo_context=repo_context), SYSTEM, args_namespace or DEFAULT_PARAMS)
+    
+    with open(section_path, "w") as f:
+        f.write(content)
+    print(f"Generated {section_path}")
+    return section_path
+
 # advanced doc generation
-async def create_docs_dir(api_overview=False, examples=False, guides=False, output_dir="docs", target_repo_path=None):
+async def create_docs_dir(api_overview=False, examples=False, guides=False, output_dir="docs", target_repo_path=None, max_concurrency=4, incremental=False,
+                          args_namespace=None, semaphore=None):
     """Create a docs directory if it doesn't exist and generate AI-powered documentation.
     
+    The index and every selected section are generated concurrently on the shared
+    AI client, with at most `max_concurrency` requests in flight. Each file is written
+    as soon as its own section finishes.
+    
+    In incremental mode a manifest in output_dir records the commit, input file
+    hashes and model parameters behind each section. Each section's fingerprint
+    covers every scanned file, so sections are invalidated as a unit: any
+    changed file regenerates all of them, and when none changed the repository
+    context is not even packed. Reuse at a finer grain, per chunk of source,
+    is done by incremental_docs.ManifestSummaryCache in the map-reduce pipeline.
+    
     Args:
         api_overview: If True, generate API documentation
         examples: If True, generate examples documentation
         guides: If True, generate guides documentation
         output_dir: Directory where documentation will be stored
         target_repo_path: Path to the repository to document (different from the Lightning MD repo)
+        max_concurrency: Maximum number of simultaneous AI calls (1 generates sections sequentially)
+        incremental: If True, only regenerate sections whose inputs changed
+        args_namespace: Model parameters (ai.GenerationParams), defaults to ai.DEFAULT_PARAMS
+        semaphore: Optional asyncio.Semaphore shared with other callers; overrides max_concurrency
+        
+    Returns:
+        list: Paths of the written files
+        
+    Raises:
+        AIRequestError: If a section could not be generated; the other sections are still written
     """
+    args_namespace = args_namespace or DEFAULT_PARAMS
     # If target_repo_path is not provided, use the current directory
     if target_repo_path is None:
         target_repo_path = "."
@@ -142,89 +232,58 @@ async def create_docs_dir(api_overview=False, examples=False, guides=False, outp
     
     # Scan repository for actual content
     print(f"Scanning target repository: {target_repo_path}...")
-    repo_data = scan_repository(target_repo_path)
-    repo_context = format_repository_context(repo_data)
+    # Scanning and packing are blocking; keep them off the (possibly shared) event loop
+    repo_data = await asyncio.to_thread(scan_repository, target_repo_path)
     print(f"Analyzed {repo_data['file_count']} files from the target repository")
     
-    # Generate index page with AI
-    print("Generating index.md...")
-    index_prompt = f"""Generate a main index page for documentation of this repository.
-    Use the following repository content as context for generating accurate documentation:
+    # Collect the sections to generate, index page always first
+    sections = ["index"]
+    if api_overview:
+        sections.append("api")
+    if examples:
+        sections.append("examples")
+    if guides:
+        sections.append("guides")
     
-    {repo_context}
+    if incremental:
+        manifest = load_manifest(output_dir)
+        file_hashes = {rel_path: entry['hash'] for rel_path, entry in repo_data['index'].items()}
+        fingerprints = {
+            section: inputs_fingerprint(file_hashes, DOC_SECTIONS[section][1], params_fingerprint(args_namespace))
+            for section in sections
+        }
+        stale = [
+            section for section in sections
+            if not section_is_current(manifest, section, fingerprints[section], os.path.join(output_dir, DOC_SECTIONS[section][0]))
+        ]
+        for section in sections:
+            if section not in stale:
+                print(f"Skipping {DOC_SECTIONS[section][0]}: inputs unchanged")
+        sections = stale
     
-    The index page should serve as a landing page that introduces the project and links to the different documentation sections.
-    Include a brief overview of the project and its purpose based on the actual code and structure."""
+    # Packing the context is only worth it when something will be generated
+    repo_context = await asyncio.to_thread(format_repository_context, repo_data) if sections else ""
     
-    index_content = await get_ai_response(index_prompt, SYSTEM, ARGS)
-    index_path = os.path.join(output_dir, "index.md")
-    with open(index_path, "w") as f:
-        f.write(index_content)
-    print(f"Generated {index_path}")
+    semaphore = semaphore or asyncio.Semaphore(max(1, max_concurrency))
+    results = await asyncio.gather(*(
+        generate_section(section, repo_context, output_dir, semaphore, args_namespace) for section in sections
+    ), return_exceptions=True)
+    # A failed section leaves no file behind; the others are kept
+    written = [result for result in results if not isinstance(result, BaseException)]
+    failures = [(section, result) for section, result in zip(sections, results) if isinstance(result, BaseException)]
     
-    if api_overview:
-        api_dir = os.path.join(output_dir, "api")
-        os.makedirs(api_dir, exist_ok=True)
-        
-        # Generate API overview with AI using actual code content
-        print("Generating API documentation...")
-        api_prompt = f"""Generate comprehensive API documentation overview for this repository.
-        Use the following repository content as context for generating accurate documentation:
-        
-        {repo_context}
-        
-        Include information about the main modules, classes, and functions found in the actual code.
-        Focus on explaining how to use the API, parameters, return values, and provide code examples where appropriate.
-        Organize the content with clear headings and sections."""
-        
-        api_content = await get_ai_response(api_prompt, SYSTEM, ARGS)
-        api_path = os.path.join(api_dir, "overview.md")
-        with open(api_path, "w") as f:
-            f.write(api_content)
-        print(f"Generated {api_path}")
-
-    if examples:
-        examples_dir = os.path.join(output_dir, "examples")
-        os.makedirs(examples_dir, exist_ok=True)
-        
-        # Generate examples with AI using actual code content
-        print("Generating examples...")
-        examples_prompt = f"""Generate practical code examples for this repository.
-        Use the following repository content as context:
-        
-        {repo_context}
-        
-        Based on the ACTUAL code in the repository, include real-world usage scenarios showing how to use the main features.
-        Make sure examples are complete, well-commented, and demonstrate best practices.
-        Start with simple examples and progress to more complex ones.
-        The examples should be directly based on the actual code structure and API found in the repository."""
-        
-        examples_content = await get_ai_response(examples_prompt, SYSTEM, ARGS)
-        examples_path = os.path.join(examples_dir, "overview.md")
-        with open(examples_path, "w") as f:
-            f.write(examples_content)
-        print(f"Generated {examples_path}")
+    if incremental:
+        commit = stamp_commit(manifest, target_repo_path)
+        for section, section_path in zip(sections, results):
+            if not isinstance(section_path, BaseException):
+                record_section(manifest, section, fingerprints[section], file_hashes, section_path, commit)
+        save_manifest(output_dir, manifest)
     
-    if guides:
-        guides_dir = os.path.join(output_dir, "guides")
-        os.makedirs(guides_dir, exist_ok=True)
-        
-        # Generate guides with AI using actual code content
-        print("Generating guides...")
-        guides_prompt = f"""Generate comprehensive guides for this repository.
-        Use the following repository content as context:
-        
-        {repo_context}
-        
-        Based on the ACTUAL code in the repository, create detailed tutorials that walk users through different aspects of using the project.
-        Include step-by-step instructions, explanations of concepts, and best practices.
-        Focus on common use cases and potential challenges users might face based on the actual code implementation."""
-        
-        guides_content = await get_ai_response(guides_prompt, SYSTEM, ARGS)
-        guides_path = os.path.join(guides_dir, "overview.md")
-        with open(guides_path, "w") as f:
-            f.write(guides_content)
-        print(f"Generated {guides_path}")
+    if failures:
+        for section, error in failures:
+            print(f"Failed to generate {DOC_SECTIONS[section][0]}: {error}")
+        raise failures[0][1]
+    return written
 
 
 # This function is no longer needed as we're not using command-line arguments
@@ -234,7 +293,7 @@ def parse_script_args():
     pass
 
 # Function to be called from app.py to generate documentation
-def generate_documentation(docs_options=None, target_repo="repo", output_dir="docs"):
+def generate_documentation(docs_options=None, target_repo="repo", output_dir="docs", max_concurrency=4, incremental=False):
     """
     Generate documentation based on selected options.
     
@@ -242,6 +301,8 @@ def generate_documentation(docs_options=None, target_repo="repo", output_dir="do
         docs_options: List of doc types to generate ("API Reference", "Examples", "Guides")
         target_repo: Path to the repository to document
         output_dir: Directory where documentation will be saved
+        max_concurrency: Maximum number of documentation sections generated at once
+        incremental: If True, only regenerate sections whose inputs changed since the last run
     """
     # Convert friendly option names to function parameters
     generate_api = "API Reference" in docs_options if docs_options else True
@@ -259,13 +320,15 @@ def generate_documentation(docs_options=None, target_repo="repo", output_dir="do
           ("Examples, " if generate_examples else "") +
           ("Guides" if generate_guides else ""))
     
-    # Run the async function using asyncio
-    return asyncio.run(create_docs_dir(
+    # Run on the shared background loop so the AI client's connection pool is reused
+    return run_async(create_docs_dir(
         api_overview=generate_api,
         examples=generate_examples,
         guides=generate_guides,
         output_dir=output_dir,
-        target_repo_path=target_repo
+        target_repo_path=target_repo,
+        max_concurrency=max_concurrency,
+        incremental=incremental
     ))
 
 
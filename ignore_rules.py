@@ -0,0 +1,196 @@
+#################################################
+# IGNORE RULES
+#################################################
+
+# .gitignore-style ignore engine shared by every repository scanner.
+# Directories are matched while walking, so ignored trees such as
+# node_modules or .git are never descended into.
+
+import os
+import re
+
+# Patterns applied to every repository in addition to its own .gitignore
+DEFAULT_IGNORE_PATTERNS = (
+    '.*',              # Hidden files and directories (.git, .venv, .idea, ...)
+    'node_modules/',
+    '__pycache__/',
+    'venv/',
+)
+
+
+def _translate(pattern):
+    """Translates a single gitignore glob (without anchoring) into a regex body."""
+    i, n = 0, len(pattern)
+    res = []
+    while i < n:
+        c = pattern[i]
+        if c == '*':
+            if pattern.startswith('**/', i):
+                # Leading or inner '**/' matches zero or more directories
+                res.append('(?:.*/)?')
+                i += 3
+                continue
+            if pattern.startswith('**', i):
+                res.append('.*')
+                i += 2
+                continue
+            res.append('[^/]*')
+        elif c == '?':
+            res.append('[^/]')
+        elif c == '[':
+            j = pattern.find(']', i + 2 if pattern.startswith('[!', i) or pattern.startswith('[^', i) else i + 1)
+            if j == -1:
+                res.append(re.escape(c))
+            else:
+                body = pattern[i + 1:j]
+                if body[:1] in ('!', '^'):
+                    body = '^' + body[1:]
+                res.append('[' + body.replace('\\', '\\\\') + ']')
+                i = j
+        elif c == '\\' and i + 1 < n:
+            i += 1
+            res.append(re.escape(pattern[i]))
+        else:
+            res.append(re.escape(c))
+        i += 1
+    return ''.join(res)
+
+
+class IgnoreRule:
+    """One parsed line of a .gitignore file."""
+
+    __slots__ = ('pattern', 'base', 'negated', 'dir_only', 'regex')
+
+    def __init__(self, pattern, base=''):
+        self.pattern = pattern
+        self.base = base.strip('/')
+        self.negated = pattern.startswith('!')
+        if self.negated:
+            pattern = pattern[1:]
+        self.dir_only = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+
+        # A slash anywhere but the end anchors the pattern to its .gitignore directory
+        anchored = '/' in pattern
+        pattern = pattern.lstrip('/')
+        body = _translate(pattern)
+        if not anchored:
+            body = '(?:.*/)?' + body
+        self.regex = re.compile('^' + body + '$', re.DOTALL)
+
+    def matches(self, rel_path, is_dir):
+        if self.dir_only and not is_dir:
+            return False
+        if self.base:
+            if not rel_path.startswith(self.base + '/'):
+                return False
+            rel_path = rel_path[len(self.base) + 1:]
+        return self.regex.match(rel_path) is not None
+
+
+class IgnoreRules:
+    """
+    Ordered collection of gitignore rules; as in git, the last matching rule wins.
+
+    Paths passed to is_ignored are relative to the repository root and use
+    forward slashes.
+    """
+
+    def __init__(self, patterns=(), base=''):
+        self.rules = []
+        self.add_patterns(patterns, base)
+
+    def add_patterns(self, patterns, base=''):
+        """Adds gitignore-style patterns scoped to the directory base."""
+        for line in patterns:
+            line = line.rstrip('\n').rstrip('\r')
+            # Trailing spaces are ignored unless escaped
+            if not line.endswith('\\ '):
+                line = line.rstrip(' ')
+            if not line or line.startswith('#'):
+                continue
+            self.rules.append(IgnoreRule(line, base))
+
+    def add_gitignore(self, gitignore_path, base=''):
+        """Loads the patterns of a .gitignore file, if it exists."""
+        try:
+            with open(gitignore_path, 'r', encoding='utf-8', errors='replace') as f:
+                self.add_patterns(f.readlines(), base)
+        except OSError:
+            pass
+
+    def copy(self):
+        clone = IgnoreRules()
+        clone.rules = list(self.rules)
+        return clone
+
+    def is_ignored(self, rel_path, is_dir=False):
+        """Returns True if the path is excluded by the rules."""
+        rel_path = rel_path.replace(os.sep, '/').strip('/')
+        ignored = False
+        for rule in self.rules:
+            if rule.negated == ignored and rule.matches(rel_path, is_dir):
+                ignored = not rule.negated
+        return ignored
+
+    @classmethod
+    def for_repo(cls, repo_path, extra_patterns=DEFAULT_IGNORE_PATTERNS, use_gitignore=True):
+        """
+        Builds the rules for a repository.
+
+        Args:
+            repo_path: Path to the repository root
+            extra_patterns: Patterns applied before the repository's own .gitignore
+            use_gitignore: If True, load the repository's root .gitignore
+
+        Returns:
+            IgnoreRules instance
+        """
+        rules = cls(extra_patterns)
+        if use_gitignore:
+            rules.add_gitignore(os.path.join(repo_path, '.gitignore'))
+        return rules
+
+
+def walk_repo(repo_path, rules=None, nested_gitignores=True):
+    """
+    Walks a repository and yields (rel_path, abs_path) for every file that is not ignored.
+
+    Ignored directories are pruned before they are entered. When nested_gitignores
+    is True, .gitignore files found in subdirectories are applied to their subtree.
+
+    Args:
+        repo_path: Path to the repository root
+        rules: IgnoreRules to apply, defaults to IgnoreRules.for_repo(repo_path)
+        nested_gitignores: If True, honour .gitignore files below the root
+    """
+    rules = (rules or IgnoreRules.for_repo(repo_path)).copy()
+    pending = ['']
+    while pending:
+        rel_dir = pending.pop()
+        abs_dir = os.path.join(repo_path, rel_dir) if rel_dir else repo_path
+        try:
+            entries = sorted(os.scandir(abs_dir), key=lambda e: e.name)
+        except OSError:
+            continue
+
+        if nested_gitignores and rel_dir and any(e.name == '.gitignore' for e in entries):
+            rules.add_gitignore(os.path.join(abs_dir, '.gitignore'), rel_dir)
+
+        subdirs = []
+        for entry in entries:
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if not is_dir and not entry.is_file():
+                    continue
+            except OSError:
+                continue
+            if rules.is_ignored(rel_path, is_dir):
+                continue
+            if is_dir:
+                subdirs.append(rel_path)
+            else:
+                yield rel_path.replace('/', os.sep), entry.path
+        # Depth-first, visiting subdirectories in name order
+        pending.extend(reversed(subdirs))
@@ -0,0 +1,135 @@
+#################################################
+# INCREMENTAL RE-DOCUMENTATION
+#################################################
+
+# Records which commit, files and model parameters every generated section
+# and chunk summary came from, so a later run regenerates only the parts
+# whose inputs changed and reuses everything else.
+
+import os
+import json
+import hashlib
+import tempfile
+from response_cache import KEY_PARAMS
+from repo_tools import get_head_commit
+from token_counter import content_hash
+
+MANIFEST_NAME = ".lightning_md_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def empty_manifest():
+    return {'version': MANIFEST_VERSION, 'commit': None, 'sections': {}, 'chunks': {}}
+
+
+def load_manifest(output_dir):
+    """Loads the manifest stored next to generated documentation, or an empty one."""
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return empty_manifest()
+    if manifest.get('version') != MANIFEST_VERSION:
+        return empty_manifest()
+    manifest.setdefault('sections', {})
+    manifest.setdefault('chunks', {})
+    return manifest
+
+
+def save_manifest(output_dir, manifest):
+    """Writes the manifest atomically into output_dir."""
+    os.makedirs(output_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=output_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, os.path.join(output_dir, MANIFEST_NAME))
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def params_fingerprint(args_namespace):
+    """Hashes the model parameters that influence generated text."""
+    params = {name: getattr(args_namespace, name, None) for name in KEY_PARAMS}
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def inputs_fingerprint(file_hashes, *extra):
+    """
+    Hashes a set of input files together with any extra strings (prompts, parameters).
+
+    Args:
+        file_hashes: Dictionary mapping relative paths to content hashes
+        extra: Additional strings that should invalidate the fingerprint when they change
+    """
+    digest = hashlib.sha256()
+    for rel_path in sorted(file_hashes):
+        digest.update(f"{rel_path}\0{file_hashes[rel_path]}\n".encode('utf-8', 'surrogatepass'))
+    for value in extra:
+        digest.update(b"\1" + str(value).encode('utf-8', 'surrogatepass'))
+    return digest.hexdigest()
+
+
+def section_is_current(manifest, section, fingerprint, output_path):
+    """True if a section was generated from the same inputs and its output still exists."""
+    entry = manifest['sections'].get(section)
+    return bool(entry) and entry.get('fingerprint') == fingerprint and os.path.exists(output_path)
+
+
+def record_section(manifest, section, fingerprint, file_hashes, output_path, commit):
+    manifest['sections'][section] = {
+        'fingerprint': fingerprint,
+        'inputs': dict(file_hashes),
+        'output': output_path,
+        'commit': commit,
+    }
+
+
+def chunk_fingerprint(chunk, args_namespace):
+    """Fingerprint of a map-reduce chunk: its files' contents and the model parameters."""
+    file_hashes = {rel_path: content_hash(content) for rel_path, content, _ in chunk['files']}
+    return inputs_fingerprint(file_hashes, chunk['id'], params_fingerprint(args_namespace)), file_hashes
+
+
+class ManifestSummaryCache:
+    """
+    Chunk-summary store backed by a manifest, used by map_reduce_docs.
+
+    Only summaries of chunks seen in the current run are kept, so the
+    manifest does not accumulate stale entries.
+    """
+
+    def __init__(self, manifest, args_namespace):
+        self.manifest = manifest
+        self.args_namespace = args_namespace
+        self.previous = manifest.get('chunks', {})
+        self.current = {}
+        self.reused = 0
+        self.generated = 0
+
+    def get(self, chunk):
+        fingerprint, file_hashes = chunk_fingerprint(chunk, self.args_namespace)
+        entry = self.previous.get(chunk['id'])
+        if entry and entry.get('fingerprint') == fingerprint:
+            self.current[chunk['id']] = entry
+            self.reused += 1
+            return entry['summary']
+        return None
+
+    def put(self, chunk, summary):
+        fingerprint, file_hashes = chunk_fingerprint(chunk, self.args_namespace)
+        self.current[chunk['id']] = {'fingerprint': fingerprint, 'inputs': file_hashes, 'summary': summary}
+        self.generated += 1
+
+    def commit(self):
+        """Replaces the manifest's chunk summaries with those used in this run."""
+        self.manifest['chunks'] = self.current
+
+
+def stamp_commit(manifest, repo_path):
+    """Records the repository's current HEAD commit in the manifest."""
+    manifest['commit'] = get_head_commit(repo_path)
+    return manifest['commit']
@@ -0,0 +1,236 @@
+#################################################
+# MAP-REDUCE DOCUMENTATION
+#################################################
+
+# Hierarchical generation for repositories larger than the context window.
+# The repository is chunked by module, every chunk is summarized concurrently
+# (map), and the summaries are combined into the final document (reduce).
+
+import os
+import asyncio
+from ai import get_ai_response, SYSTEM
+from context_packer import default_block, truncate_to_tokens, file_importance, DEFAULT_CONTEXT_BUDGET
+from token_counter import count_tokens, count_file_tokens
+from code_chunker import chunk_file
+
+DEFAULT_CHUNK_TOKENS = 12000      # Source tokens sent with each map request
+DEFAULT_MAP_CONCURRENCY = 8       # Map requests in flight at once
+ROOT_MODULE = "(root)"
+
+MAP_PROMPT = """You are reading one part of a larger software repository: the module `{module}` (part {part} of {parts}).
+Summarize this code for a technical writer who will document the whole repository but cannot see the source.
+
+Cover:
+- The purpose of this module and of each file
+- Public classes, functions and constants, with their signatures and what they return
+- How these pieces interact with each other and with other modules they import
+- Configuration, entry points, side effects and anything a user must know to use it
+
+Be precise and concise. Use Markdown bullet lists. Do not invent behaviour that is not in the code.
+
+{source}"""
+
+COMBINE_PROMPT = """Below are summaries of several parts of a software repository.
+Merge them into one condensed summary that keeps every public API, entry point and cross-module relationship,
+removes repetition, and stays factual. Use Markdown bullet lists grouped by module.
+
+{summaries}"""
+
+REDUCE_PROMPT = """{user_prompt}
+
+The repository is too large to include in full. The following module summaries were produced from its complete source code;
+use them as the authoritative description of the repository.
+
+{summaries}"""
+
+
+def module_of(rel_path, depth=1):
+    """Returns the module a file belongs to: its first `depth` directory components."""
+    parts = rel_path.replace(os.sep, '/').split('/')[:-1]
+    return '/'.join(parts[:depth]) if parts else ROOT_MODULE
+
+
+def chunk_repository(file_contents, token_counts=None, chunk_tokens=DEFAULT_CHUNK_TOKENS, module_depth=1):
+    """
+    Groups repository files into chunks of at most chunk_tokens source tokens, by module.
+
+    Files stay together with the rest of their module where possible; modules
+    larger than the budget are split into several consecutive parts, and single
+    files larger than the budget are split into whole functions and classes
+    with code_chunker.chunk_file, labelled with their line range. Only a
+    single line larger than the budget is truncated.
+
+    Args:
+        file_contents: Dictionary mapping relative file paths to contents
+        token_counts: Optional {path: tokens}, e.g. from the repository file index
+        chunk_tokens: Token budget for the source of one chunk
+        module_depth: Number of leading directories that identify a module
+
+    Returns:
+        list: Chunks as dicts with 'id', 'module', 'part', 'parts', 'tokens' and
+        'files' as (label, content, truncated) tuples, where label is the file path
+        or, for a piece of a split file, "path (name, lines a-b)"
+    """
+    token_counts = token_counts or count_file_tokens(file_contents)
+
+    modules = {}
+    for rel_path in file_contents:
+        modules.setdefault(module_of(rel_path, module_depth), []).append(rel_path)
+
+    chunks = []
+    for module in sorted(modules):
+        # Most important files first, so the first part of a split module carries the core of it
+        paths = sorted(modules[module], key=lambda path: (-file_importance(path), path))
+        parts = []
+        current, current_tokens = [], 0
+        for rel_path in paths:
+            content = file_contents[rel_path]
+            tokens = token_counts.get(rel_path)
+            if tokens is None:
+                tokens = count_tokens(content)
+            if tokens > chunk_tokens:
+                pieces = [(f"{rel_path} ({piece.name}, lines {piece.start_line}-{piece.end_line})", piece.text, piece.tokens)
+                          for piece in chunk_file(rel_path, content, chunk_tokens, chunk_tokens // 4)]
+            else:
+                pieces = [(rel_path, content, tokens)]
+            for label, text, tokens in pieces:
+                truncated = tokens > chunk_tokens
+                if truncated:
+                    text = truncate_to_tokens(text, chunk_tokens)
+                    tokens = count_tokens(text)
+                if current and current_tokens + tokens > chunk_tokens:
+                    parts.append((current, current_tokens))
+                    current, current_tokens = [], 0
+                current.append((label, text, truncated))
+                current_tokens += tokens
+        if current:
+            parts.append((current, current_tokens))
+
+        for part_number, (files, tokens) in enumerate(parts, start=1):
+            chunks.append({
+                'id': f"{module}#{part_number}",
+                'module': module,
+                'part': part_number,
+                'parts': len(parts),
+                'files': files,
+                'tokens': tokens,
+            })
+    return chunks
+
+
+async def summarize_chunk(chunk, args_namespace, semaphore, summary_cache=None):
+    """Runs the map step for one chunk and returns its Markdown summary.
+    
+    When a summary_cache (see incremental_docs.ManifestSummaryCache) holds a
+    summary for the chunk's unchanged inputs, it is reused without an AI call.
+    """
+    if summary_cache is not None:
+        cached = summary_cache.get(chunk)
+        if cached is not None:
+            return cached
+
+    source = ''.join(default_block(rel_path, content, truncated) for rel_path, content, truncated in chunk['files'])
+    prompt = MAP_PROMPT.format(module=chunk['module'], part=chunk['part'], parts=chunk['parts'], source=source)
+    async with semaphore:
+        summary = await get_ai_response(prompt, SYSTEM, args_namespace)
+
+    if summary_cache is not None:
+        summary_cache.put(chunk, summary)
+    return summary
+
+
+def _format_summaries(summaries):
+    return ''.join(f"### {title}\n\n{summary}\n\n" for title, summary in summaries)
+
+
+async def combine_summaries(summaries, args_namespace, semaphore, budget=DEFAULT_CONTEXT_BUDGET):
+    """
+    Reduces (title, summary) pairs until they fit in budget tokens.
+
+    Summaries are merged in groups that each fit the budget; the merged
+    summaries are merged again until a single level fits.
+    """
+    while count_tokens(_format_summaries(summaries)) > budget and len(summaries) > 1:
+        groups, current, current_tokens = [], [], 0
+        for title, summary in summaries:
+            tokens = count_tokens(_format_summaries([(title, summary)]))
+            if current and current_tokens + tokens > budget:
+                groups.append(current)
+                current, current_tokens = [], 0
+            current.append((title, summary))
+            current_tokens += tokens
+        if current:
+            groups.append(current)
+        if len(groups) == len(summaries):
+            # Every summary fills the budget on its own; merge them pairwise
+            groups = [summaries[i:i + 2] for i in range(0, len(summaries), 2)]
+
+        async def merge(group):
+            if len(group) == 1:
+                return group[0]
+            title = f"{group[0][0]} … {group[-1][0]}"
+            async with semaphore:
+                merged = await get_ai_response(COMBINE_PROMPT.format(summaries=_format_summaries(group)), SYSTEM, args_namespace)
+            return title, merged
+
+        summaries = list(await asyncio.gather(*(merge(group) for group in groups)))
+    return summaries
+
+
+async def generate_map_reduce_documentation(file_contents, user_prompt, args_namespace, token_counts=None,
+                                            chunk_tokens=DEFAULT_CHUNK_TOKENS, max_concurrency=DEFAULT_MAP_CONCURRENCY,
+                                            reduce_budget=DEFAULT_CONTEXT_BUDGET, progress_callback=None, summary_cache=None,
+                                            semaphore=None):
+    """
+    Documents a repository of any size with a map-reduce pipeline.
+
+    Args:
+        file_contents: Dictionary mapping relative file paths to contents
+        user_prompt: The user's documentation request, applied in the final reduce step
+        args_namespace: Model parameters for all AI calls
+        token_counts: Optional {path: tokens} to avoid re-tokenizing files
+        chunk_tokens: Source tokens per map request
+        max_concurrency: Maximum number of simultaneous AI calls
+        reduce_budget: Token budget for the summaries sent to the final reduce step
+        progress_callback: Optional callable(done, total, message) for progress reporting
+        summary_cache: Optional store of chunk summaries from a previous run, for incremental updates
+        semaphore: Optional asyncio.Semaphore shared with other callers; overrides max_concurrency
+
+    Returns:
+        str: The generated Markdown documentation
+
+    Raises:
+        AIRequestError: If any map, combine or reduce request fails
+    """
+    def report(done, total, message):
+        print(message)
+        if progress_callback:
+            progress_callback(done, total, message)
+
+    # Tokenizing and splitting is blocking work; keep it off the (possibly shared) event loop
+    chunks = await asyncio.to_thread(chunk_repository, file_contents, token_counts, chunk_tokens)
+    total_steps = len(chunks) + 1
+    report(0, total_steps, f"Split {len(file_contents)} files into {len(chunks)} chunks")
+
+    semaphore = semaphore or asyncio.Semaphore(max(1, max_concurrency))
+    tasks = [asyncio.ensure_future(summarize_chunk(chunk, args_namespace, semaphore, summary_cache)) for chunk in chunks]
+    try:
+        for done, future in enumerate(asyncio.as_completed(tasks), start=1):
+            await future
+            report(done, total_steps, f"Summarized {done} of {len(chunks)} chunks")
+    except BaseException:
+        # Don't keep spending requests on a document that cannot be completed;
+        # finished summaries stay in the response cache for the next attempt
+        for task in tasks:
+            task.cancel()
+        raise
+
+    # Keep summaries in module order for a coherent reduce step
+    summaries = [(chunk['id'], task.result()) for chunk, task in zip(chunks, tasks)]
+    summaries = await combine_summaries(summaries, args_namespace, semaphore, reduce_budget)
+    report(total_steps - 1, total_steps, "Composing the final document")
+    prompt = REDUCE_PROMPT.format(user_prompt=user_prompt, summaries=_format_summaries(summaries))
+    async with semaphore:
+        documentation = await get_ai_response(prompt, SYSTEM, args_namespace)
+    report(total_steps, total_steps, "Documentation complete")
+    return documentation
@@ -0,0 +1,248 @@
+#################################################
+# RATE-LIMITED REQUEST SCHEDULER
+#################################################
+
+# Every OpenAI request goes through one scheduler that keeps request-per-minute
+# and token-per-minute budgets, learns the account's real limits from the
+# x-ratelimit-* response headers, and retries transient failures with jittered
+# exponential backoff. Permanent failures raise typed errors instead of
+# returning placeholder text that could end up in generated documentation.
+
+import os
+import re
+import time
+import random
+import asyncio
+import threading
+
+DEFAULT_REQUESTS_PER_MINUTE = int(os.environ.get("LIGHTNING_MD_RPM", 500))
+DEFAULT_TOKENS_PER_MINUTE = int(os.environ.get("LIGHTNING_MD_TPM", 200000))
+DEFAULT_MAX_RETRIES = 6
+BASE_RETRY_DELAY = 1.0            # Seconds before the first retry
+MAX_RETRY_DELAY = 60.0            # Upper bound of a single backoff
+
+# HTTP statuses worth retrying; everything else 4xx is the request's fault
+TRANSIENT_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class AIRequestError(Exception):
+    """Base class for failed AI requests.
+
+    Attributes:
+        status_code: HTTP status of the last attempt, if the API answered
+        attempts: Number of attempts made
+    """
+
+    def __init__(self, message, status_code=None, attempts=1):
+        super().__init__(message)
+        self.status_code = status_code
+        self.attempts = attempts
+
+
+class AIRequestRejectedError(AIRequestError):
+    """The API rejected the request in a way retrying cannot fix (bad request, auth, quota)."""
+
+
+class AIRetriesExhaustedError(AIRequestError):
+    """A transient failure (rate limit, timeout, server error) persisted through every retry."""
+
+
+def parse_reset_duration(value):
+    """Parses OpenAI reset durations such as '1s', '6m0s' or '250ms' into seconds."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+    matches = re.findall(r'([\d.]+)(ms|s|m|h)', value)
+    if not matches:
+        return None
+    return sum(float(amount) * units[unit] for amount, unit in matches)
+
+
+def _status_code(exc):
+    return getattr(exc, 'status_code', None)
+
+
+def is_transient(exc):
+    """True if a failed request may succeed when retried."""
+    import openai
+    if isinstance(exc, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    status = _status_code(exc)
+    if status == 429:
+        # Exhausted billing quota also answers 429 but will not recover by waiting
+        body = getattr(exc, 'body', None)
+        code = body.get('code') if isinstance(body, dict) else getattr(exc, 'code', None)
+        return code != 'insufficient_quota'
+    return status in TRANSIENT_STATUS_CODES
+
+
+def _retry_after(exc):
+    """Seconds the server asked us to wait, from Retry-After headers, if any."""
+    response = getattr(exc, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    if headers.get('retry-after-ms'):
+        try:
+            return float(headers['retry-after-ms']) / 1000
+        except ValueError:
+            pass
+    return parse_reset_duration(headers.get('retry-after'))
+
+
+class RateLimitScheduler:
+    """
+    Token-bucket scheduler for API requests.
+
+    Two buckets refill continuously at the per-minute limits: one counts
+    requests, the other tokens (prompt plus max completion, as the API
+    counts them). A request waits until both buckets can pay for it, so
+    under load throughput is set by the limits rather than by 429s. Limits
+    and remaining budgets are corrected from response headers as they arrive.
+
+    State is guarded by a thread lock and waits use asyncio.sleep, so one
+    scheduler can be shared by every event loop in the process.
+    """
+
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE,
+                 max_retries=DEFAULT_MAX_RETRIES, base_delay=BASE_RETRY_DELAY, max_delay=MAX_RETRY_DELAY):
+        self.request_limit = float(requests_per_minute)
+        self.token_limit = float(tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._requests = self.request_limit
+        self._tokens = self.token_limit
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'retries': 0, 'rate_limited': 0, 'waited_seconds': 0.0}
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.request_limit, self._requests + elapsed * self.request_limit / 60)
+        self._tokens = min(self.token_limit, self._tokens + elapsed * self.token_limit / 60)
+
+    def _try_acquire(self, tokens):
+        """Takes budget for one request, or returns the seconds to wait before trying again."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self._paused_until:
+                return self._paused_until - now
+            # A request larger than the whole bucket is let through once the bucket is full
+            tokens = min(tokens, self.token_limit)
+            waits = []
+            if self._requests < 1:
+                waits.append((1 - self._requests) * 60 / self.request_limit)
+            if self._tokens < tokens:
+                waits.append((tokens - self._tokens) * 60 / self.token_limit)
+            if waits:
+                return max(waits)
+            self._requests -= 1
+            self._tokens -= tokens
+            return 0
+
+    async def acquire(self, tokens):
+        """Waits until the budgets allow a request of `tokens` estimated tokens."""
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                return
+            self.stats['waited_seconds'] += wait
+            await asyncio.sleep(wait)
+
+    def settle(self, estimated_tokens, used_tokens):
+        """Returns unused budget once a request reports how many tokens it really used."""
+        if used_tokens is None:
+            return
+        with self._lock:
+            self._tokens = min(self.token_limit, self._tokens + max(0, estimated_tokens - used_tokens))
+
+    def pause(self, seconds):
+        """Holds back every request for `seconds`, e.g. after a 429."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers):
+        """Adopts the limits and remaining budgets reported in x-ratelimit-* headers."""
+        if not headers:
+            return
+        def number(name):
+            try:
+                return float(headers.get(name))
+            except (TypeError, ValueError):
+                return None
+
+        with self._lock:
+            self._refill(time.monotonic())
+            limit_requests = number('x-ratelimit-limit-requests')
+            limit_tokens = number('x-ratelimit-limit-tokens')
+            remaining_requests = number('x-ratelimit-remaining-requests')
+            remaining_tokens = number('x-ratelimit-remaining-tokens')
+            if limit_requests:
+                self.request_limit = limit_requests
+            if limit_tokens:
+                self.token_limit = limit_tokens
+            # Other processes share the account's budget; never assume more than the server reports
+            if remaining_requests is not None:
+                self._requests = min(self._requests, remaining_requests)
+            if remaining_tokens is not None:
+                self._tokens = min(self._tokens, remaining_tokens)
+
+    def backoff_delay(self, attempt, exc=None):
+        """Full-jitter exponential backoff, never shorter than the server's Retry-After."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = _retry_after(exc) if exc is not None else None
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    async def run(self, request_fn, estimated_tokens):
+        """
+        Runs an API request under the budgets, retrying transient failures.
+
+        Args:
+            request_fn: Coroutine function called with no arguments for each attempt
+            estimated_tokens: Tokens to reserve for the request
+
+        Returns:
+            The result of request_fn
+
+        Raises:
+            AIRequestRejectedError: If the request failed permanently
+            AIRetriesExhaustedError: If transient failures outlasted max_retries
+        """
+        import openai
+        for attempt in range(self.max_retries + 1):
+            await self.acquire(estimated_tokens)
+            self.stats['requests'] += 1
+            try:
+                return await request_fn()
+            except openai.APIError as e:
+                response = getattr(e, 'response', None)
+                self.update_from_headers(getattr(response, 'headers', None))
+                status = _status_code(e)
+                if not is_transient(e):
+                    raise AIRequestRejectedError(f"AI request rejected: {e}", status, attempt + 1) from e
+                if attempt == self.max_retries:
+                    raise AIRetriesExhaustedError(
+                        f"AI request failed after {attempt + 1} attempts: {e}", status, attempt + 1) from e
+
+                delay = self.backoff_delay(attempt, e)
+                if status == 429:
+                    self.stats['rate_limited'] += 1
+                    self.pause(delay)
+                self.stats['retries'] += 1
+                print(f"AI request failed ({status or type(e).__name__}), retrying in {delay:.1f}s "
+                      f"(attempt {attempt + 1} of {self.max_retries})")
+                await asyncio.sleep(delay)
+
+
+# Shared scheduler used by ai.get_ai_response and ai.stream_ai_response
+scheduler = RateLimitScheduler()
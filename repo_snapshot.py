@@ -0,0 +1,249 @@
+#################################################
+# REPOSITORY SNAPSHOTS
+#################################################
+
+# Everything the repository screens show about a checkout - the tree text,
+# file and directory counts and size statistics - computed in a single
+# os.scandir walk and cached by repository path and HEAD commit, so widget
+# interactions no longer re-walk the repository on every Streamlit rerun.
+
+import os
+import html
+import threading
+from collections import OrderedDict
+from ignore_rules import IgnoreRules
+
+SNAPSHOT_CACHE_SIZE = 32          # Snapshots kept across reruns and sessions
+TREE_MAX_NODES = 2000             # Entries rendered by the collapsible tree
+
+TREE_STYLE = (
+    "<style>"
+    ".repo-tree{font-family:monospace;font-size:0.9em;line-height:1.5;max-height:600px;overflow:auto}"
+    ".repo-tree details>div,.repo-tree details>details{margin-left:1.2em}"
+    ".repo-tree summary{cursor:pointer}"
+    ".repo-tree .size{color:grey;margin-left:0.5em}"
+    "</style>"
+)
+
+
+def _format_size(size):
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+class RepoSnapshot:
+    """
+    Immutable view of a repository checkout at one commit.
+
+    Entries are filtered with the same ignore rules as the repository scanner
+    (hidden entries including .git, node_modules, __pycache__, virtualenvs
+    and .gitignore patterns), so counts and sizes describe what is documented.
+
+    Attributes:
+        repo_path: Absolute path of the repository
+        commit: HEAD commit SHA, or None outside a git repository
+        entries: List of (rel_path, is_dir, depth, size) in display order
+        tree_text: Text tree with box-drawing branches
+        file_count: Number of files
+        dir_count: Number of directories below the root
+        total_bytes: Combined size of all files
+        extension_stats: {extension: (files, bytes)}, largest first
+    """
+
+    def __init__(self, repo_path, commit, entries, tree_text):
+        self.repo_path = repo_path
+        self.commit = commit
+        self.entries = entries
+        self.tree_text = tree_text
+        self.file_count = 0
+        self.dir_count = 0
+        self.total_bytes = 0
+        stats = {}
+        for rel_path, is_dir, _, size in entries:
+            if is_dir:
+                self.dir_count += 1
+                continue
+            self.file_count += 1
+            self.total_bytes += size
+            ext = os.path.splitext(rel_path)[1].lower() or '(none)'
+            files, total = stats.get(ext, (0, 0))
+            stats[ext] = (files + 1, total + size)
+        self.extension_stats = dict(sorted(stats.items(), key=lambda item: -item[1][1]))
+        self._html = {}
+
+    def tree_html(self, max_nodes=TREE_MAX_NODES):
+        """
+        Renders the tree as one HTML block of collapsible <details> nodes.
+
+        At most max_nodes entries are included; the result is memoized on the
+        snapshot, so it is built once per commit.
+        """
+        cached = self._html.get(max_nodes)
+        if cached is not None:
+            return cached
+
+        parts = [TREE_STYLE, '<div class="repo-tree"><details open><summary>📁 ',
+                 html.escape(os.path.basename(self.repo_path)), '/</summary>']
+        open_dirs = 0
+        for rel_path, is_dir, depth, size in self.entries[:max_nodes]:
+            while open_dirs > depth:
+                parts.append('</details>')
+                open_dirs -= 1
+            name = html.escape(rel_path.rsplit('/', 1)[-1])
+            if is_dir:
+                parts.append(f'<details><summary>📁 {name}/</summary>')
+                open_dirs += 1
+            else:
+                parts.append(f'<div>📄 {name}<span class="size">{_format_size(size)}</span></div>')
+        parts.append('</details>' * open_dirs)
+        hidden = len(self.entries) - max_nodes
+        if hidden > 0:
+            parts.append(f'<div class="size">… {hidden:,} more entries not shown</div>')
+        parts.append('</details></div>')
+
+        self._html[max_nodes] = ''.join(parts)
+        return self._html[max_nodes]
+
+
+def read_head_commit(repo_path):
+    """
+    Reads the HEAD commit SHA straight from .git, without starting a git process.
+
+    Falls back to `git rev-parse` for layouts this doesn't handle (worktrees,
+    unusual refs), and returns None outside a git repository.
+    """
+    git_dir = os.path.join(repo_path, '.git')
+    try:
+        with open(os.path.join(git_dir, 'HEAD'), 'r') as f:
+            head = f.read().strip()
+        if not head.startswith('ref: '):
+            return head
+        ref = head[5:]
+        try:
+            with open(os.path.join(git_dir, ref), 'r') as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            with open(os.path.join(git_dir, 'packed-refs'), 'r') as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) == 2 and parts[1] == ref:
+                        return parts[0]
+    except (FileNotFoundError, NotADirectoryError):
+        if not os.path.exists(git_dir):
+            return None
+    except OSError:
+        pass
+    from repo_tools import get_head_commit
+    return get_head_commit(repo_path)
+
+
+def build_repo_snapshot(repo_path, commit=None, rules=None):
+    """
+    Walks a repository once with os.scandir and builds its snapshot.
+
+    Directories are listed before files, each group sorted by name, matching
+    the original tree view. Like ignore_rules.walk_repo, ignored entries are
+    pruned, nested .gitignore files apply to their subtree and symlinked
+    directories are skipped.
+
+    Args:
+        repo_path: Path to the local repository
+        commit: HEAD commit to record, if already known
+        rules: IgnoreRules to apply, defaults to IgnoreRules.for_repo(repo_path)
+
+    Returns:
+        RepoSnapshot
+    """
+    repo_path = os.path.abspath(repo_path)
+    rules = (rules or IgnoreRules.for_repo(repo_path)).copy()
+    entries = []
+    lines = [f"{os.path.basename(repo_path)}/"]
+
+    def add_directory(dir_path, rel_dir, prefix, depth):
+        try:
+            with os.scandir(dir_path) as it:
+                children = list(it)
+        except OSError:
+            return
+
+        if rel_dir and any(entry.name == '.gitignore' for entry in children):
+            rules.add_gitignore(os.path.join(dir_path, '.gitignore'), rel_dir)
+
+        listed = []
+        for entry in children:
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if not is_dir and not entry.is_file():
+                    continue
+            except OSError:
+                continue
+            if rules.is_ignored(rel_path, is_dir):
+                continue
+            listed.append((not is_dir, entry.name, entry))
+        listed.sort(key=lambda item: (item[0], item[1]))
+
+        for i, (is_file, name, entry) in enumerate(listed):
+            is_last = i == len(listed) - 1
+            branch = "└── " if is_last else "├── "
+            rel_path = f"{rel_dir}/{name}" if rel_dir else name
+            if is_file:
+                try:
+                    size = entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    size = 0
+                entries.append((rel_path, False, depth, size))
+                lines.append(f"{prefix}{branch}{name}")
+            else:
+                entries.append((rel_path, True, depth, 0))
+                lines.append(f"{prefix}{branch}{name}/")
+                add_directory(entry.path, rel_path, prefix + ("    " if is_last else "│   "), depth + 1)
+
+    add_directory(repo_path, "", "", 0)
+    return RepoSnapshot(repo_path, commit, entries, "\n".join(lines))
+
+
+_snapshots = OrderedDict()
+_snapshots_lock = threading.Lock()
+
+
+def get_repo_snapshot(repo_path):
+    """
+    Returns the snapshot of a repository, walking it only when its HEAD moved.
+
+    Snapshots are cached by absolute path and HEAD commit. Changes that don't
+    move HEAD (e.g. re-cloning the same commit over a modified checkout) are
+    picked up only after invalidate_repo_snapshot(), which pulling calls.
+    Directories outside git (such as the generated docs directory) have no
+    commit to detect changes by, so they are walked on every call.
+    """
+    repo_path = os.path.abspath(repo_path)
+    key = (repo_path, read_head_commit(repo_path))
+    if key[1] is None:
+        return build_repo_snapshot(repo_path)
+    with _snapshots_lock:
+        snapshot = _snapshots.get(key)
+        if snapshot is not None:
+            _snapshots.move_to_end(key)
+            return snapshot
+
+    snapshot = build_repo_snapshot(repo_path, key[1])
+    with _snapshots_lock:
+        _snapshots[key] = snapshot
+        while len(_snapshots) > SNAPSHOT_CACHE_SIZE:
+            _snapshots.popitem(last=False)
+    return snapshot
+
+
+def invalidate_repo_snapshot(repo_path=None):
+    """Drops cached snapshots of one repository path, or of all repositories."""
+    with _snapshots_lock:
+        if repo_path is None:
+            _snapshots.clear()
+            return
+        repo_path = os.path.abspath(repo_path)
+        for key in [key for key in _snapshots if key[0] == repo_path]:
+            del _snapshots[key]
@@ -8,13 +8,59 @@ import os
 import sys
 import subprocess
 import shutil
+from clone_cache import clone_with_cache
 
-def clone_github_repo(github_url):
+def build_clone_command(github_url, repo_dir, depth=1, blobless=False, sparse_paths=None, branch=None):
+    """
+    Builds the git clone command for the requested clone mode.
+    
+    Args:
+        github_url (str): URL or local path of the repository to clone
+        repo_dir (str): Destination directory
+        depth (int): History depth to fetch, None for full history
+        blobless (bool): If True, fetch blobs lazily (--filter=blob:none)
+        sparse_paths (list): If given, start a sparse checkout limited to these paths
+        branch (str): Branch or tag to check out, defaults to the remote HEAD
+        
+    Returns:
+        list: The command as an argument list
+    """
+    # --depth and --filter are ignored for plain local paths, so use file:// for them
+    source = github_url
+    if (depth or blobless or sparse_paths) and os.path.isdir(github_url):
+        source = "file://" + os.path.abspath(github_url)
+    
+    cmd = ["git", "clone"]
+    if depth:
+        cmd += ["--depth", str(depth)]
+    if blobless or sparse_paths:
+        cmd += ["--filter=blob:none"]
+    if sparse_paths:
+        cmd += ["--sparse"]
+    if branch:
+        cmd += ["--branch", branch]
+    cmd += [source, repo_dir]
+    return cmd
+
+def clone_github_repo(github_url, repo_dir="repo", depth=1, blobless=False, sparse_paths=None, branch=None, use_cache=True):
     """
     Clones a public GitHub repository to a folder named 'repo'
     
+    Only the working tree is ever read, so by default a depth-1 shallow clone
+    is made. Blobless (--filter=blob:none) and sparse checkouts limited to
+    sparse_paths can be requested to cut clone time and disk use further.
+    
+    Full-tree clones go through the local mirror cache (see clone_cache), so
+    pulling a repository again only fetches the commits added since.
+    
     Args:
         github_url (str): URL of the GitHub repository to clone
+        repo_dir (str): Directory to clone into, defaults to 'repo'
+        depth (int): History depth to fetch, None for a full clone
+        blobless (bool): If True, make a partial clone that fetches blobs on demand
+        sparse_paths (list): Paths to restrict the checkout to (cone mode directories)
+        branch (str): Branch or tag to check out
+        use_cache (bool): If True, clone through the mirror cache (ignored for blobless or sparse clones)
         
     Raises:
         subprocess.CalledProcessError: If git clone command fails
@@ -23,9 +69,6 @@ def clone_github_repo(github_url):
     Returns:
         bool: True if repository was cloned successfully
     """
-    # Get the target directory name
-    repo_dir = "repo"
-    
     # Handle existing repository by renaming instead of deleting
     if os.path.exists(repo_dir):
         print(f"Handling existing '{repo_dir}' directory...")
@@ -61,8 +104,16 @@ def clone_github_repo(github_url):
     
     try:
         # Clone the repository
+        if use_cache and not blobless and not sparse_paths:
+            print(f"Cloning {github_url} into '{repo_dir}' via the clone cache...")
+            clone_with_cache(github_url, repo_dir, branch=branch, depth=depth)
+            print("Repository cloned successfully!")
+            return True
+        
         print(f"Cloning {github_url} into '{repo_dir}'...")
-        subprocess.run(["git", "clone", github_url, repo_dir], check=True)
+        subprocess.run(build_clone_command(github_url, repo_dir, depth, blobless, sparse_paths, branch), check=True)
+        if sparse_paths:
+            subprocess.run(["git", "-C", repo_dir, "sparse-checkout", "set", *sparse_paths], check=True)
         print("Repository cloned successfully!")
         return True
     except subprocess.CalledProcessError as e:
@@ -74,6 +125,23 @@ def clone_github_repo(github_url):
         print(f"Error: {error_msg}")
         raise Exception(error_msg)
 
+def get_head_commit(repo_path="repo"):
+    """
+    Returns the commit SHA checked out in a local repository.
+    
+    Args:
+        repo_path (str): Path to the local git repository
+        
+    Returns:
+        str: The HEAD commit SHA, or None if repo_path is not a git repository
+    """
+    try:
+        result = subprocess.run(["git", "-C", repo_path, "rev-parse", "HEAD"],
+                                check=True, capture_output=True, text=True)
+        return result.stdout.strip()
+    except (subprocess.CalledProcessError, OSError):
+        return None
+
 def main(github_url=None):
     """Main function that can be called by other modules or run directly"""
     if github_url is None:
@@ -116,95 +184,237 @@ if __name__ == "__main__":
 
 import os
 import json
-import chardet
+import time
+from concurrent.futures import ThreadPoolExecutor
+from ignore_rules import IgnoreRules, walk_repo
+from token_counter import count_file_tokens, content_hash
+
+BINARY_EXTENSIONS = [
+    '.png', '.jpg', '.jpeg', '.gif', '.bmp', '.ico', '.svg',  # Images
+    '.pdf', '.doc', '.docx', '.ppt', '.pptx', '.xls', '.xlsx',  # Documents
+    '.zip', '.tar', '.gz', '.rar', '.7z',  # Archives
+    '.exe', '.dll', '.so', '.dylib',  # Binaries
+    '.pyc', '.pyo', '.pyd',  # Python compiled
+    '.jar', '.war', '.ear',  # Java
+    '.mp3', '.mp4', '.avi', '.mov', '.flv',  # Media
+]
+
+# Only this many leading bytes are handed to chardet when UTF-8 decoding fails
+CHARDET_SAMPLE_BYTES = 64 * 1024
+
+# Files read per batch when indexing a repository without keeping its contents
+INDEX_BATCH_FILES = 256
+
+# Leading bytes read to check a file is readable when its contents aren't needed yet
+PROBE_BYTES = 4096
 
-def get_local_repo_contents(repo_path='./repo'):
+def decode_file_bytes(raw_data):
+    """
+    Decodes raw file bytes to text, trying UTF-8 first.
+    
+    Falls back to chardet on a bounded prefix of the data only when the
+    fast UTF-8 decode fails. Newlines are normalized the same way text-mode
+    open() would.
+    
+    Args:
+        raw_data: Bytes read from the file, or any buffer such as an mmap
+        
+    Returns:
+        Decoded string
+    """
+    try:
+        content = str(raw_data, 'utf-8')
+    except UnicodeDecodeError:
+        import chardet  # Only needed for non-UTF-8 files
+        result = chardet.detect(raw_data[:CHARDET_SAMPLE_BYTES])
+        encoding = result['encoding'] or 'utf-8'
+        try:
+            content = str(raw_data, encoding, 'replace')
+        except LookupError:
+            content = str(raw_data, 'utf-8', 'replace')
+    
+    if content.startswith('\ufeff'):
+        content = content[1:]
+    if '\r' in content:
+        content = content.replace('\r\n', '\n').replace('\r', '\n')
+    return content
+
+def read_text_file(file_path):
+    """Reads a file once and returns its decoded text and size in bytes."""
+    with open(file_path, 'rb') as f:
+        raw_data = f.read()
+    if not raw_data:
+        return "", 0
+    return decode_file_bytes(raw_data), len(raw_data)
+
+def probe_text_file(file_path):
+    """Checks a file can be read without decoding it, and returns its size in bytes."""
+    with open(file_path, 'rb') as f:
+        f.read(PROBE_BYTES)
+        return os.fstat(f.fileno()).st_size
+
+def build_file_index(file_contents, file_sizes=None, model="gpt-4o-mini"):
+    """
+    Builds a compact per-file index of size, line count, token count and content hash.
+    
+    Token counts are computed in one batch so consumers never need to
+    re-tokenize the repository.
+    
+    Args:
+        file_contents: Dictionary with relative file paths and contents
+        file_sizes: Optional dictionary of on-disk sizes in bytes per path
+        model: Model whose tokenizer is used for counting
+        
+    Returns:
+        Dictionary mapping each path to {'bytes', 'lines', 'tokens', 'hash'}
+    """
+    file_sizes = file_sizes or {}
+    token_counts = count_file_tokens(file_contents, model)
+    index = {}
+    for rel_path, content in file_contents.items():
+        size = file_sizes.get(rel_path)
+        if size is None:
+            size = len(content.encode('utf-8', 'surrogatepass'))
+        index[rel_path] = {
+            'bytes': size,
+            'lines': content.count('\n') + (1 if content and not content.endswith('\n') else 0),
+            'tokens': token_counts[rel_path],
+            'hash': content_hash(content),
+        }
+    return index
+
+def index_token_counts(file_index):
+    """Returns {path: tokens} from a file index, for use with the context packer."""
+    return {rel_path: entry['tokens'] for rel_path, entry in file_index.items()}
+
+def get_local_repo_contents(repo_path='./repo', max_workers=None, return_stats=False, use_gitignore=True, with_index=False, lazy=False):
     """
     Scans a local repository folder and returns a dictionary with file paths as keys
     and their raw contents as values.
     
+    Files are read on a thread pool, each exactly once. Hidden files, vendored
+    directories and anything matched by the repository's .gitignore are pruned
+    during the walk.
+    
     Args:
         repo_path: Path to the local repository folder, defaults to './repo'
+        max_workers: Number of reader threads, defaults to ThreadPoolExecutor's choice
+        return_stats: If True, also return a dictionary of scan statistics
+        use_gitignore: If True, apply the repository's own .gitignore rules
+        with_index: If True, also return a per-file index (see build_file_index)
+        lazy: If True, return a repo_view.LazyRepoContents that reads files on access
+            instead of a dictionary holding every file; the index is still built,
+            a batch of files at a time, and without an index files are only probed
+            for readability and size
         
     Returns:
-        Dictionary with relative file paths as keys and file contents as values
+        Dictionary with relative file paths as keys and file contents as values.
+        When with_index and/or return_stats are set, a tuple of
+        (contents, index, stats) with only the requested extras is returned.
     """
     # Normalize and get absolute path
     repo_path = os.path.abspath(repo_path)
     
     if not os.path.exists(repo_path):
         print(f"Repository folder not found: {repo_path}")
-        return {}
+        return _scan_result({}, {}, {}, with_index, return_stats)
         
     file_contents = {}
-    binary_extensions = [
-        '.png', '.jpg', '.jpeg', '.gif', '.bmp', '.ico', '.svg',  # Images
-        '.pdf', '.doc', '.docx', '.ppt', '.pptx', '.xls', '.xlsx',  # Documents
-        '.zip', '.tar', '.gz', '.rar', '.7z',  # Archives
-        '.exe', '.dll', '.so', '.dylib',  # Binaries
-        '.pyc', '.pyo', '.pyd',  # Python compiled
-        '.jar', '.war', '.ear',  # Java
-        '.mp3', '.mp4', '.avi', '.mov', '.flv',  # Media
-    ]
+    file_sizes = {}
+    start_time = time.perf_counter()
     
     # Keep track of files processed for reporting
     total_files = 0
     processed_files = 0
     skipped_files = 0
+    total_bytes = 0
     
     print(f"Scanning repository folder: {repo_path}")
     
-    # Walk through the repository
-    for root, dirs, files in os.walk(repo_path):
-        # Skip hidden directories (typically .git, node_modules, etc.)
-        dirs[:] = [d for d in dirs if not d.startswith('.')]
-        dirs[:] = [d for d in dirs if d != 'node_modules']
+    # Walk through the repository and collect the files to read
+    to_read = []
+    ignore_rules = IgnoreRules.for_repo(repo_path, use_gitignore=use_gitignore)
+    for rel_path, file_path in walk_repo(repo_path, ignore_rules, nested_gitignores=use_gitignore):
+        total_files += 1
         
-        for file in files:
-            total_files += 1
-            file_path = os.path.join(root, file)
-            
-            # Skip hidden files
-            if file.startswith('.'):
-                skipped_files += 1
-                continue
-                
-            # Check file extension
-            _, ext = os.path.splitext(file)
-            if ext.lower() in binary_extensions:
+        # Check file extension
+        _, ext = os.path.splitext(rel_path)
+        if ext.lower() in BINARY_EXTENSIONS:
+            skipped_files += 1
+            continue
+        
+        to_read.append((rel_path, file_path))
+    
+    # A lazy scan without an index only needs sizes; contents are read on access
+    size_only = lazy and not with_index
+    
+    def read_one(item):
+        rel_path, file_path = item
+        try:
+            if size_only:
+                return rel_path, (None, probe_text_file(file_path)), None
+            return rel_path, read_text_file(file_path), None
+        except Exception as e:
+            return rel_path, None, e
+    
+    file_index = {}
+    batch = {}
+    
+    # Read files in parallel; map preserves the walk order in the result
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for rel_path, result, error in executor.map(read_one, to_read):
+            if error is not None:
+                print(f"Skipping {rel_path}: {str(error)}")
                 skipped_files += 1
                 continue
-            
-            # Get relative path from repo_path
-            rel_path = os.path.relpath(file_path, repo_path)
-            
-            try:
-                # First try to detect encoding
-                with open(file_path, 'rb') as f:
-                    raw_data = f.read()
-                    if not raw_data:
-                        file_contents[rel_path] = ""
-                        processed_files += 1
-                        continue
-                        
-                    # Try to detect encoding
-                    result = chardet.detect(raw_data)
-                    encoding = result['encoding'] or 'utf-8'
-                
-                # Then read with detected encoding
-                with open(file_path, 'r', encoding=encoding, errors='replace') as f:
-                    content = f.read()
-                    file_contents[rel_path] = content
-                    processed_files += 1
-                    
-            except Exception as e:
-                print(f"Skipping {rel_path}: {str(e)}")
-                skipped_files += 1
+            content, size = result
+            file_sizes[rel_path] = size
+            total_bytes += size
+            processed_files += 1
+            if not lazy:
+                file_contents[rel_path] = content
+            elif with_index:
+                # Index this batch, then let its contents go
+                batch[rel_path] = content
+                if len(batch) >= INDEX_BATCH_FILES:
+                    file_index.update(build_file_index(batch, file_sizes))
+                    batch = {}
+    
+    if lazy:
+        from repo_view import LazyRepoContents
+        if batch:
+            file_index.update(build_file_index(batch, file_sizes))
+        file_contents = LazyRepoContents(repo_path, list(file_sizes), file_sizes)
+    elif with_index:
+        file_index = build_file_index(file_contents, file_sizes)
+    
+    elapsed = time.perf_counter() - start_time
+    stats = {
+        'total_files': total_files,
+        'processed_files': processed_files,
+        'skipped_files': skipped_files,
+        'total_bytes': total_bytes,
+        'elapsed_seconds': elapsed,
+        'files_per_second': processed_files / elapsed if elapsed > 0 else 0.0,
+        'mb_per_second': total_bytes / (1024 * 1024) / elapsed if elapsed > 0 else 0.0,
+    }
     
     print(f"Repository scan complete!")
     print(f"Processed {processed_files} of {total_files} files ({skipped_files} files skipped)")
+    print(f"Read {total_bytes / (1024 * 1024):.1f} MB in {elapsed:.2f}s "
+          f"({stats['files_per_second']:.0f} files/s, {stats['mb_per_second']:.1f} MB/s)")
     
-    return file_contents
+    return _scan_result(file_contents, file_index, stats, with_index, return_stats)
+
+def _scan_result(file_contents, file_index, stats, with_index, return_stats):
+    if not (with_index or return_stats):
+        return file_contents
+    result = (file_contents,)
+    if with_index:
+        result += (file_index,)
+    if return_stats:
+        result += (stats,)
+    return result
 
 def save_repo_contents(file_contents, output_file='repo_contents.json'):
     """
@@ -227,46 +437,22 @@ def get_repo_file_tree(repo_path='./repo'):
     """
     Generates a text representation of the repository file tree.
     
+    The tree comes from the cached repository snapshot, so repeated calls
+    for an unchanged checkout don't walk the filesystem again.
+    
     Args:
         repo_path: Path to the local repository folder, defaults to './repo'
         
     Returns:
         String containing formatted file tree
     """
+    from repo_snapshot import get_repo_snapshot
     repo_path = os.path.abspath(repo_path)
     
     if not os.path.exists(repo_path):
         return f"Repository folder not found: {repo_path}"
     
-    lines = []
-    repo_name = os.path.basename(repo_path)
-    lines.append(f"{repo_name}/")
-    
-    def add_directory(dir_path, prefix=""):
-        entries = sorted(os.listdir(dir_path), key=lambda x: (os.path.isfile(os.path.join(dir_path, x)), x))
-        
-        # Skip hidden entries and node_modules
-        entries = [entry for entry in entries if not entry.startswith('.') and entry != 'node_modules']
-        
-        for i, entry in enumerate(entries):
-            is_last = i == len(entries) - 1
-            entry_path = os.path.join(dir_path, entry)
-            
-            if is_last:
-                branch = "└── "
-                next_prefix = prefix + "    "
-            else:
-                branch = "├── "
-                next_prefix = prefix + "│   "
-            
-            if os.path.isdir(entry_path):
-                lines.append(f"{prefix}{branch}{entry}/")
-                add_directory(entry_path, next_prefix)
-            else:
-                lines.append(f"{prefix}{branch}{entry}")
-    
-    add_directory(repo_path)
-    return "\n".join(lines)
+    return get_repo_snapshot(repo_path).tree_text
 
 if __name__ == "__main__":
     # Default repository path
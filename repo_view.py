@@ -0,0 +1,120 @@
+#################################################
+# LAZY REPOSITORY VIEW
+#################################################
+
+# Read-only, dict-like view of a repository's text files backed by the working
+# tree. Contents are read when a file is accessed, large files through mmap,
+# and only a bounded LRU of decoded text is kept, so a session holds memory in
+# proportion to what it displays or sends rather than to the repository size.
+
+import os
+import mmap
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from repo_tools import decode_file_bytes
+
+DEFAULT_CACHE_CHARS = 8 * 1024 * 1024     # Decoded characters kept per view
+MMAP_THRESHOLD_BYTES = 1024 * 1024        # Larger files are memory-mapped instead of read
+
+
+def read_file_buffer(file_path, size=None):
+    """
+    Decodes a file to text, memory-mapping it when it is large.
+
+    Mapping lets the decoder read the page cache directly instead of copying
+    the whole file into a bytes object first.
+    """
+    with open(file_path, 'rb') as f:
+        if size is None:
+            size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return ""
+        if size < MMAP_THRESHOLD_BYTES:
+            return decode_file_bytes(f.read())
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return decode_file_bytes(mapped)
+
+
+class LazyRepoContents(Mapping):
+    """
+    {relative path: text} mapping whose values are read from disk on access.
+
+    Supports everything the plain dictionary returned by
+    get_local_repo_contents did for reading: len(), iteration in scan order,
+    `in`, [], get(), keys(), items() and values().
+
+    Args:
+        repo_path: Root of the working tree
+        paths: Relative paths of the text files, in display order
+        sizes: Optional {path: bytes} from the scan, used to choose mmap
+        cache_chars: Upper bound on decoded characters kept in memory
+    """
+
+    def __init__(self, repo_path, paths, sizes=None, cache_chars=DEFAULT_CACHE_CHARS):
+        self.repo_path = os.path.abspath(repo_path)
+        self._paths = list(paths)
+        self._path_set = set(self._paths)
+        self._sizes = dict(sizes or {})
+        self.cache_chars = cache_chars
+        self._cache = OrderedDict()
+        self._cached_chars = 0
+        self._lock = threading.Lock()
+        self.reads = 0
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def __contains__(self, rel_path):
+        return rel_path in self._path_set
+
+    def __getitem__(self, rel_path):
+        if rel_path not in self._path_set:
+            raise KeyError(rel_path)
+        with self._lock:
+            content = self._cache.get(rel_path)
+            if content is not None:
+                self._cache.move_to_end(rel_path)
+                return content
+
+        file_path = os.path.join(self.repo_path, rel_path)
+        try:
+            content = read_file_buffer(file_path, self._sizes.get(rel_path))
+        except OSError as e:
+            # The file was listed at scan time but has since gone away
+            print(f"Could not read {rel_path}: {str(e)}")
+            return ""
+        self.reads += 1
+
+        with self._lock:
+            if len(content) <= self.cache_chars and rel_path not in self._cache:
+                self._cache[rel_path] = content
+                self._cached_chars += len(content)
+                while self._cached_chars > self.cache_chars:
+                    _, evicted = self._cache.popitem(last=False)
+                    self._cached_chars -= len(evicted)
+        return content
+
+    def size(self, rel_path):
+        """On-disk size of a file in bytes, as recorded by the scan."""
+        return self._sizes.get(rel_path, 0)
+
+    def cache_info(self):
+        """Returns {'files', 'chars', 'reads'} for the decoded-text cache."""
+        with self._lock:
+            return {'files': len(self._cache), 'chars': self._cached_chars, 'reads': self.reads}
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+            self._cached_chars = 0
+
+    def to_dict(self):
+        """Reads every file into a plain dictionary (e.g. for JSON export)."""
+        return {rel_path: self[rel_path] for rel_path in self._paths}
+
+    def __repr__(self):
+        return f"LazyRepoContents({self.repo_path!r}, {len(self._paths)} files)"
@@ -0,0 +1,191 @@
+#################################################
+# LLM RESPONSE CACHE
+#################################################
+
+# Persistent, content-addressed cache for AI responses. Entries are keyed on a
+# hash of the model, sampling parameters and both prompts, so identical
+# requests are answered from disk instead of being re-sent to OpenAI.
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+
+DEFAULT_CACHE_DIR = os.environ.get("LIGHTNING_MD_CACHE_DIR", os.path.join(".cache", "responses"))
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024     # 256 MB of cached responses
+DEFAULT_MAX_AGE = 7 * 24 * 60 * 60        # Entries expire after a week
+
+# Request parameters that influence the generated text
+KEY_PARAMS = ("model", "temp", "top_p", "max_tokens", "pp", "fp", "seed", "stop")
+
+
+def make_cache_key(user_prompt_content, system_prompt_content, args_namespace):
+    """
+    Builds a stable cache key for one AI request.
+
+    Args:
+        user_prompt_content: The user prompt sent to the model
+        system_prompt_content: The system prompt sent to the model
+        args_namespace: Object carrying the model and sampling parameters
+
+    Returns:
+        str: Hex SHA-256 digest identifying the request
+    """
+    payload = {name: getattr(args_namespace, name, None) for name in KEY_PARAMS}
+    payload["system"] = system_prompt_content
+    payload["user"] = user_prompt_content
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class ResponseCache:
+    """
+    On-disk response cache with size- and age-based eviction.
+
+    Each entry is stored as a JSON file under a two-character fan-out directory.
+    Entries expire max_age seconds after they were written, however often they
+    are read. File modification times double as last-access times, so the least
+    recently used entries are evicted first once the cache grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, max_age=DEFAULT_MAX_AGE):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._total_bytes = None
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _iter_entries(self):
+        """Yields (path, size, mtime) for every entry currently on disk."""
+        if not os.path.isdir(self.cache_dir):
+            return
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".json"):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    yield entry.path, stat.st_size, stat.st_mtime
+
+    def get(self, key):
+        """Returns the cached response for key, or None on a miss or expired entry."""
+        path = self._entry_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+            # Age counts from creation; the mtime is refreshed on every hit
+            if self.max_age and time.time() - record["created"] > self.max_age:
+                self._remove(path)
+                raise FileNotFoundError(path)
+            response = record["response"]
+            # Refresh the access time so LRU eviction keeps hot entries
+            os.utime(path, None)
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return response
+
+    def put(self, key, response, metadata=None):
+        """Stores a response under key and evicts old entries if the cache is over budget."""
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        record = {"response": response, "created": time.time(), "metadata": metadata or {}}
+
+        # Write atomically so concurrent readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(record, f, ensure_ascii=False)
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes += os.path.getsize(path) - old_size
+        if self._current_size() > self.max_bytes:
+            self.evict()
+
+    def _remove(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            self.evictions += 1
+            if self._total_bytes is not None:
+                self._total_bytes -= size
+
+    def _current_size(self):
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._iter_entries())
+            return self._total_bytes
+
+    def evict(self):
+        """
+        Drops stale entries, then least recently used ones until under max_bytes.
+
+        An entry not read for max_age is certainly expired and is dropped here
+        without opening it; entries that are still read are expired by get().
+        """
+        now = time.time()
+        entries = []
+        for path, size, mtime in self._iter_entries():
+            if self.max_age and now - mtime > self.max_age:
+                self._remove(path)
+            else:
+                entries.append((mtime, size, path))
+
+        total = sum(size for _, size, _ in entries)
+        with self._lock:
+            self._total_bytes = total
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def clear(self):
+        """Removes every cached entry."""
+        for path, _, _ in list(self._iter_entries()):
+            self._remove(path)
+
+    def stats(self):
+        """Returns hit/miss counters and the current on-disk footprint."""
+        size = self._current_size()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+            }
+
+
+# Shared cache used by ai.get_ai_response
+response_cache = ResponseCache()
@@ -0,0 +1,76 @@
+import os
+import sys
+import subprocess
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from repo_tools import build_clone_command, clone_github_repo
+
+GIT_IDENTITY = ["-c", "user.name=Test", "-c", "user.email=test@example.com"]
+
+
+def git(*args, cwd=None):
+    return subprocess.run(["git", *GIT_IDENTITY, *args], cwd=cwd, check=True,
+                          capture_output=True, text=True).stdout.strip()
+
+
+@pytest.fixture
+def bare_repo(tmp_path):
+    """A bare repository with three commits touching directories a/ and b/."""
+    bare = tmp_path / "origin.git"
+    git("init", "--bare", "--initial-branch=main", str(bare))
+    # Partial clones over file:// need the server side to accept filters
+    git("-C", str(bare), "config", "uploadpack.allowFilter", "true")
+
+    work = tmp_path / "work"
+    git("clone", str(bare), str(work))
+    git("-C", str(work), "checkout", "-b", "main")
+    for i, directory in enumerate(["a", "b", "a"]):
+        os.makedirs(work / directory, exist_ok=True)
+        (work / directory / f"file{i}.txt").write_text(f"content {i}\n")
+        git("-C", str(work), "add", "-A")
+        git("-C", str(work), "commit", "-m", f"commit {i}")
+    git("-C", str(work), "push", "origin", "main")
+    return str(bare)
+
+
+def commit_count(repo_dir):
+    return int(git("-C", repo_dir, "rev-list", "--count", "HEAD"))
+
+
+def test_depth_one_clone_has_a_single_commit(bare_repo, tmp_path):
+    repo_dir = str(tmp_path / "shallow")
+    assert clone_github_repo(bare_repo, repo_dir, depth=1, use_cache=False)
+    assert commit_count(repo_dir) == 1
+    assert os.path.exists(os.path.join(repo_dir, "b", "file1.txt"))
+
+
+def test_sparse_clone_checks_out_only_requested_paths(bare_repo, tmp_path):
+    repo_dir = str(tmp_path / "sparse")
+    assert clone_github_repo(bare_repo, repo_dir, sparse_paths=["a"], use_cache=False)
+    assert sorted(os.listdir(os.path.join(repo_dir, "a"))) == ["file0.txt", "file2.txt"]
+    assert not os.path.exists(os.path.join(repo_dir, "b"))
+
+
+def test_blobless_full_clone_keeps_history(bare_repo, tmp_path):
+    repo_dir = str(tmp_path / "blobless")
+    assert clone_github_repo(bare_repo, repo_dir, depth=None, blobless=True, use_cache=False)
+    assert commit_count(repo_dir) == 3
+    assert git("-C", repo_dir, "config", "remote.origin.partialclonefilter") == "blob:none"
+
+
+@pytest.mark.parametrize("options", [
+    {"depth": 1},
+    {"depth": None, "blobless": True},
+    {"depth": None, "sparse_paths": ["a"]},
+])
+def test_local_directory_is_rewritten_to_file_url(bare_repo, options):
+    cmd = build_clone_command(bare_repo, "dest", **options)
+    assert cmd[-2] == "file://" + os.path.abspath(bare_repo)
+
+
+def test_plain_full_clone_keeps_local_path(bare_repo):
+    cmd = build_clone_command(bare_repo, "dest", depth=None)
+    assert cmd[-2] == bare_repo
@@ -0,0 +1,34 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import response_cache
+from response_cache import ResponseCache
+
+
+def test_frequently_read_entry_expires_after_max_age(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "time", lambda: now[0])
+    cache = ResponseCache(cache_dir=str(tmp_path), max_age=100)
+    cache.put("ab" * 32, "cached answer")
+
+    # Hits every 30 seconds keep the entry recently used, but not young
+    for _ in range(3):
+        now[0] += 30
+        assert cache.get("ab" * 32) == "cached answer"
+
+    now[0] += 30
+    assert cache.get("ab" * 32) is None
+    assert not os.path.exists(cache._entry_path("ab" * 32))
+
+
+def test_entry_is_served_within_max_age(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "time", lambda: now[0])
+    cache = ResponseCache(cache_dir=str(tmp_path), max_age=100)
+    cache.put("cd" * 32, "cached answer")
+
+    now[0] += 99
+    assert cache.get("cd" * 32) == "cached answer"
+    assert cache.stats()["hits"] == 1
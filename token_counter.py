@@ -0,0 +1,123 @@
+#################################################
+# TOKEN ACCOUNTING
+#################################################
+
+# Fast token counting: the tiktoken encoder is loaded once per model, files
+# are encoded in batches on tiktoken's thread pool and results are memoized
+# by content hash so unchanged text is never tokenized twice.
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+DEFAULT_MODEL = "gpt-4o-mini"
+MEMO_MAX_ENTRIES = 200000         # Memoized counts kept across calls
+MEMO_MIN_CHARS = 1024             # Shorter strings are cheaper to encode than to hash
+BATCH_THREADS = min(8, os.cpu_count() or 1)
+
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model=DEFAULT_MODEL):
+    """Returns the tiktoken encoder for a model, loading it only once."""
+    # Imported here so modules that only need content_hash start without tiktoken
+    import tiktoken
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        # Unknown or newer model names: fall back to the GPT-4o tokenizer
+        return tiktoken.get_encoding("o200k_base")
+
+
+def content_hash(text):
+    """Returns a short stable hash of a string's contents."""
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+
+
+def _memo_get(key):
+    with _memo_lock:
+        count = _memo.get(key)
+        if count is not None:
+            _memo.move_to_end(key)
+        return count
+
+
+def _memo_put(key, count):
+    with _memo_lock:
+        _memo[key] = count
+        _memo.move_to_end(key)
+        while len(_memo) > MEMO_MAX_ENTRIES:
+            _memo.popitem(last=False)
+
+
+def count_tokens(text, model=DEFAULT_MODEL):
+    """Return the number of tokens a plain string will use for the given model."""
+    enc = get_encoding(model)
+    if len(text) < MEMO_MIN_CHARS:
+        return len(enc.encode(text, disallowed_special=()))
+
+    key = (enc.name, content_hash(text))
+    count = _memo_get(key)
+    if count is None:
+        count = len(enc.encode(text, disallowed_special=()))
+        _memo_put(key, count)
+    return count
+
+
+def count_tokens_batch(texts, model=DEFAULT_MODEL, num_threads=BATCH_THREADS):
+    """
+    Counts tokens for many strings at once.
+
+    Strings already seen are answered from the memo; the rest are encoded
+    together with encode_batch on tiktoken's thread pool.
+
+    Args:
+        texts: List of strings
+        model: Model whose tokenizer is used
+        num_threads: Encoder threads for the uncached strings
+
+    Returns:
+        list: Token counts in the same order as texts
+    """
+    enc = get_encoding(model)
+    counts = [None] * len(texts)
+    pending_keys = []
+    pending_indexes = []
+    pending_texts = []
+    for i, text in enumerate(texts):
+        key = (enc.name, content_hash(text))
+        count = _memo_get(key)
+        if count is None:
+            pending_keys.append(key)
+            pending_indexes.append(i)
+            pending_texts.append(text)
+        else:
+            counts[i] = count
+
+    if pending_texts:
+        encoded = enc.encode_batch(pending_texts, num_threads=num_threads, disallowed_special=())
+        for key, i, tokens in zip(pending_keys, pending_indexes, encoded):
+            counts[i] = len(tokens)
+            _memo_put(key, counts[i])
+    return counts
+
+
+def count_file_tokens(file_contents, model=DEFAULT_MODEL):
+    """
+    Counts tokens per file for a {path: content} dictionary.
+
+    Returns:
+        dict: Mapping of path to token count
+    """
+    paths = list(file_contents)
+    counts = count_tokens_batch([file_contents[path] for path in paths], model)
+    return dict(zip(paths, counts))
+
+
+def count_repo_tokens(file_contents, model=DEFAULT_MODEL):
+    """Returns the total number of content tokens across all files."""
+    return sum(count_file_tokens(file_contents, model).values())
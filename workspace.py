@@ -0,0 +1,143 @@
+#################################################
+# SESSION WORKSPACES
+#################################################
+
+# Gives every app session its own repository and documentation directories
+# so concurrent sessions in one server process never share ./repo or ./docs.
+
+import os
+import re
+import time
+import uuid
+import shutil
+import threading
+
+WORKSPACE_ROOT = os.environ.get("LIGHTNING_MD_WORKSPACE_ROOT", "workspaces")
+WORKSPACE_TTL = 2 * 60 * 60                     # Idle sessions expire after two hours
+WORKSPACE_QUOTA_BYTES = 2 * 1024 * 1024 * 1024  # Disk quota per session
+CLEANUP_INTERVAL = 5 * 60                       # Minimum seconds between expiry sweeps
+LAST_ACTIVE_MARKER = ".last_active"
+
+
+class WorkspaceQuotaError(Exception):
+    """Raised when a session workspace grows beyond its disk quota."""
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class Workspace:
+    """Directories owned by a single session."""
+
+    def __init__(self, session_id, root):
+        self.session_id = session_id
+        self.root = root
+        self.repo_dir = os.path.join(root, "repo")
+        self.docs_dir = os.path.join(root, "docs")
+
+    def touch(self):
+        """Marks the workspace as active now."""
+        marker = os.path.join(self.root, LAST_ACTIVE_MARKER)
+        with open(marker, "a"):
+            pass
+        os.utime(marker, None)
+
+    def last_active(self):
+        try:
+            return os.path.getmtime(os.path.join(self.root, LAST_ACTIVE_MARKER))
+        except OSError:
+            return 0.0
+
+    def disk_usage(self):
+        """Returns the number of bytes stored in the workspace."""
+        return _dir_size(self.root)
+
+
+class WorkspaceManager:
+    """
+    Creates, tracks and expires per-session workspaces under a common root.
+
+    One manager is shared by every session of the server process.
+    """
+
+    def __init__(self, root=WORKSPACE_ROOT, ttl=WORKSPACE_TTL, quota_bytes=WORKSPACE_QUOTA_BYTES):
+        self.root = root
+        self.ttl = ttl
+        self.quota_bytes = quota_bytes
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+
+    @staticmethod
+    def new_session_id():
+        return uuid.uuid4().hex
+
+    def get(self, session_id):
+        """
+        Returns the workspace for a session, creating its directories if needed.
+
+        Also sweeps expired workspaces at most once per CLEANUP_INTERVAL.
+        """
+        if not re.fullmatch(r"[A-Za-z0-9_-]+", session_id):
+            raise ValueError(f"Invalid session id: {session_id!r}")
+
+        workspace = Workspace(session_id, os.path.join(self.root, session_id))
+        os.makedirs(workspace.root, exist_ok=True)
+        workspace.touch()
+
+        if time.time() - self._last_cleanup > CLEANUP_INTERVAL:
+            self.cleanup_expired()
+        return workspace
+
+    def check_quota(self, workspace):
+        """
+        Raises WorkspaceQuotaError if the workspace exceeds the per-session disk quota.
+
+        Returns:
+            int: Current disk usage in bytes
+        """
+        usage = workspace.disk_usage()
+        if self.quota_bytes and usage > self.quota_bytes:
+            raise WorkspaceQuotaError(
+                f"Workspace uses {usage / (1024 * 1024):.0f} MB, "
+                f"over the {self.quota_bytes / (1024 * 1024):.0f} MB quota"
+            )
+        return usage
+
+    def release(self, session_id):
+        """Deletes a session's workspace immediately."""
+        shutil.rmtree(os.path.join(self.root, session_id), ignore_errors=True)
+
+    def cleanup_expired(self):
+        """
+        Deletes workspaces that have been idle for longer than the TTL.
+
+        Returns:
+            list: Session ids whose workspaces were removed
+        """
+        with self._lock:
+            self._last_cleanup = time.time()
+            if not os.path.isdir(self.root):
+                return []
+            expired = []
+            for entry in os.scandir(self.root):
+                if not entry.is_dir(follow_symlinks=False):
+                    continue
+                workspace = Workspace(entry.name, entry.path)
+                if self._last_cleanup - workspace.last_active() > self.ttl:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    expired.append(entry.name)
+            if expired:
+                print(f"Removed {len(expired)} expired workspace(s)")
+            return expired
+
+
+# Shared manager used by the Streamlit app
+workspace_manager = WorkspaceManager()